@@ -1,12 +1,13 @@
 import random
 
 
-def generate_sudoku():
+# rng: the random.Random (or the random module) to draw from, one per worker makes the boards reproducible
+def generate_sudoku(rng=random):
     size = 9
     board = [[0] * size for _ in range(size)]
 
     # Generate a random initial configuration for the first row
-    first_row = random.sample(range(1, size + 1), size)
+    first_row = rng.sample(range(1, size + 1), size)
     for i in range(size):
         board[0][i] = first_row[i]
 
@@ -28,7 +29,8 @@ def generate_sudoku():
         for row in range(size):
             for col in range(size):
                 if board[row][col] == 0:
-                    for num in range(1, size + 1):
+                    # the numbers are tried in a random order so the other rows are random too
+                    for num in rng.sample(range(1, size + 1), size):
                         if is_valid(board, row, col, num):
                             board[row][col] = num
 
@@ -49,12 +51,12 @@ def generate_sudoku():
     return board
 
 
-def remove_numbers(board, num_to_remove):
+def remove_numbers(board, num_to_remove, rng=random):
     # Create a list of all positions on the board
     positions = [(i, j) for i in range(9) for j in range(9)]
 
     # Shuffle the list to randomize the removal order
-    random.shuffle(positions)
+    rng.shuffle(positions)
 
     # Remove numbers from the board while ensuring it remains solvable
     for pos in positions:
@@ -117,13 +119,14 @@ def print_sudoku(board):
 
 
 # Example usage:
-sudoku_board = generate_sudoku()
-print("Generated Sudoku:")
-print_sudoku(sudoku_board)
+if __name__ == '__main__':
+    sudoku_board = generate_sudoku()
+    print("Generated Sudoku:")
+    print_sudoku(sudoku_board)
 
-# Remove some numbers to create a puzzle
-num_to_remove = 40  # Adjust the number of removed elements as needed
-remove_numbers(sudoku_board, num_to_remove)
+    # Remove some numbers to create a puzzle
+    num_to_remove = 40  # Adjust the number of removed elements as needed
+    remove_numbers(sudoku_board, num_to_remove)
 
-print("\nSudoku Puzzle:")
-print_sudoku(sudoku_board)
+    print("\nSudoku Puzzle:")
+    print_sudoku(sudoku_board)
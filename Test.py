@@ -2,6 +2,7 @@
 from timeit import default_timer as timer
 from sudokucsp import SudokuCSP
 from csp import backtracking_search, mrv, unordered_domain_values, forward_checking, mac, no_inference
+from presolver import presolve, format_trace
 
 
 class Test:
@@ -75,12 +76,27 @@ class Test:
                 self.original_board[7] = [0, 0, 0, 0, 0, 5, 9, 0, 0]
                 self.original_board[8] = [8, 0, 0, 0, 7, 0, 0, 0, 0]
 
-    def start(self, inf):
+    def set_board_from_bank(self, bank, index):
+        """Use puzzle number index of a PuzzleBank (see puzzlebank.py) instead of the boards above."""
+        self.original_board = bank.board(index)
+
+    def start(self, inf, cache=None, logic=True):
         s = SudokuCSP(self.original_board)
+        self.trace = []
+
+        def search(board):
+            # the search gets the domains the techniques could not finish
+            if logic:
+                self.trace = presolve(s)
+            a = backtracking_search(s, select_unassigned_variable=mrv, order_domain_values=unordered_domain_values,
+                                    inference=inf)
+            return s.to_board(a) if a else None
 
         self.start = timer()
-        a = backtracking_search(s, select_unassigned_variable=mrv, order_domain_values=unordered_domain_values,
-                                inference=inf)
+        if cache is None:
+            a = search(self.original_board)
+        else:
+            a = cache.solve(self.original_board, search)
         self.end = timer()
         if a:
             print("\nSolution found")
@@ -97,6 +113,7 @@ class Test:
         time = round(self.end - self.start, 5)
         print("Time: " + str(time) + " seconds")
         print("N. BT: " + str(self.bt))
+        print("Logic: " + format_trace(self.trace))
 
 
 def main():
@@ -110,6 +127,11 @@ def main():
     level = 1
     # which can assume 3 values: 0, 1 and 2 so we can use 3 boards for each level
     which = 2
+    # set cache to SolutionCache() (from solutioncache) to answer repeated boards without searching,
+    # leave it None to time the search itself on every run
+    cache = None
+    # set logic to False to search from the board itself, without the techniques of presolver.py first
+    logic = True
     # if needed just modify self.which = self.which%3 to %4 in method set_board of Test Class
     # to add a new board, and add a clause "elif self.which == 3:
     #                                                             self.original_board[0] = first row
@@ -118,7 +140,7 @@ def main():
     for i in range(n_test):
         t1 = Test()
         t1.set_board(level, which)
-        t1.start(inf)
+        t1.start(inf, cache, logic)
         back_track.append(t1.bt)
         time.append(round(t1.end - t1.start, 5))
 
@@ -0,0 +1,298 @@
+"""Traces of AC3: which arcs removed which values and put which arcs back in the queue.
+
+AC3 takes a trace sink (its trace argument, or csp.AC3_TRACE for all the calls that do
+not give one, mac included). Without a sink nothing is recorded and the only cost is a
+test per arc. A sink has one method, begin(csp), called once per AC3 call, which
+returns None to skip the call or a recorder with:
+    revised(Xi, Xj, removed, queued)    the arc (Xi, Xj) removed the values removed, and
+                                        the queue holds queued arcs after adding the arcs
+                                        (Xk, Xi) that were not in it
+    end(consistent)                     the call is over, False if a domain became empty
+
+The sinks:
+    PrintTrace(file)            prints the tree of every call at its end, as the old
+                                AC3(..., display_tree=True) did
+    RingTrace(size, every)      keeps in memory the last size revisions of one AC3 call
+                                in every; events() returns them, render() prints them
+    BinaryTrace(path)           writes every call to a compact binary file from a thread,
+                                dropping calls when the writer falls behind
+and the tree is printed back from a binary file with
+
+    python ac3trace.py trace.bin [--run N]
+
+    import csp, ac3trace
+    csp.AC3_TRACE = ac3trace.BinaryTrace('solver.ac3')
+"""
+
+import argparse
+import collections
+import json
+import queue
+import struct
+import sys
+import threading
+
+MAGIC = b'AC3T1\n'
+# a revision: Xi and Xj (indexes in the variables), the removed values (a bitmask of their
+# indexes in the values of the problem) and the length of the queue
+EVENT = struct.Struct('<HHQI')
+# a call: its number and its number of revisions (then the revisions and a byte, 1 if consistent)
+RUN = struct.Struct('<II')
+LENGTH = struct.Struct('<I')
+
+
+def format_revision(Xi, Xj, removed, neighbors):
+    """The line of the tree for a revision, as the old print_ac3_tree printed it."""
+    added = [(Xk, Xi) for Xk in neighbors if Xk != Xi]
+    return '{} -> {}: Removed {}, Queue {}'.format(Xi, Xj, set(removed), added)
+
+
+# ______________________________________________________________________________
+# In memory
+
+
+class _PrintRecorder:
+
+    __slots__ = ('lines', 'neighbors', 'file')
+
+    def __init__(self, neighbors, file):
+        self.lines = []
+        self.neighbors = neighbors
+        self.file = file
+
+    def revised(self, Xi, Xj, removed, queued):
+        self.lines.append(format_revision(Xi, Xj, removed, self.neighbors[Xi]))
+
+    def end(self, consistent):
+        print('=' * 60 + '\n', file=self.file)
+        print('AC3 Tree:', file=self.file)
+        for line in self.lines:
+            print(line, file=self.file)
+            print('=' * 60 + '\n', file=self.file)
+
+
+class PrintTrace:
+    """The tree of every AC3 call printed to file (stdout by default) when the call ends."""
+
+    def __init__(self, file=None):
+        self.file = file
+
+    def begin(self, csp):
+        return _PrintRecorder(csp.neighbors, self.file or sys.stdout)
+
+
+class _RingRecorder:
+
+    __slots__ = ('ring', 'run', 'neighbors')
+
+    def __init__(self, ring, run, neighbors):
+        self.ring = ring
+        self.run = run
+        self.neighbors = neighbors
+
+    def revised(self, Xi, Xj, removed, queued):
+        self.ring.append((self.run, Xi, Xj, tuple(removed), queued, self.neighbors[Xi]))
+
+    def end(self, consistent):
+        pass
+
+
+class RingTrace:
+    """The last size revisions of the AC3 calls number 0, every, 2 * every ... (memory stays
+    the same however long the solver runs)."""
+
+    def __init__(self, size=4096, every=1):
+        if size < 1 or every < 1:
+            raise ValueError('size and every must be positive')
+        self.ring = collections.deque(maxlen=size)
+        self.every = every
+        self.calls = 0
+
+    def begin(self, csp):
+        run = self.calls
+        self.calls += 1
+        if run % self.every:
+            return None
+        return _RingRecorder(self.ring, run, csp.neighbors)
+
+    def events(self):
+        """The kept revisions, the oldest first, as (run, Xi, Xj, removed, queued)."""
+        return [event[:5] for event in self.ring]
+
+    def render(self, file=None):
+        """Print the kept revisions as the tree, call by call."""
+        file = file or sys.stdout
+        run = None
+        for event_run, Xi, Xj, removed, _, neighbors in self.ring:
+            if event_run != run:
+                run = event_run
+                print('AC3 call {}:'.format(run), file=file)
+            print(format_revision(Xi, Xj, removed, neighbors), file=file)
+
+
+# ______________________________________________________________________________
+# Binary log
+
+
+class _BinaryRecorder:
+
+    __slots__ = ('sink', 'run', 'index', 'bits', 'events')
+
+    def __init__(self, sink, run, index, bits):
+        self.sink = sink
+        self.run = run
+        self.index = index
+        self.bits = bits
+        self.events = bytearray()
+
+    def revised(self, Xi, Xj, removed, queued):
+        bits = self.bits
+        mask = 0
+        for value in removed:
+            mask |= bits[value]
+        self.events += EVENT.pack(self.index[Xi], self.index[Xj], mask, queued)
+
+    def end(self, consistent):
+        count = len(self.events) // EVENT.size
+        self.sink.put(b'R' + RUN.pack(self.run, count) + bytes(self.events) + (b'\x01' if consistent else b'\x00'))
+
+
+class BinaryTrace:
+    """Every AC3 call written to path (or an open binary file) by a background thread.
+
+    The file holds a problem record (the variables, their values and neighbors) each time
+    the traced csp changes structure, then a record per call. The records wait in a queue of
+    max_pending calls; when it is full the call is dropped (counted in self.dropped) instead
+    of making the solver wait. close() writes what is left."""
+
+    def __init__(self, path, max_pending=1024):
+        self.file = open(path, 'wb') if isinstance(path, str) else path
+        self.own_file = isinstance(path, str)
+        self.file.write(MAGIC)
+        self.pending = queue.Queue(max_pending)
+        self.dropped = 0
+        self.calls = 0
+        self.problem = None
+        self.index = self.bits = None
+        self.writer = threading.Thread(target=self._write, name='ac3trace-writer', daemon=True)
+        self.writer.start()
+
+    def _write(self):
+        while True:
+            record = self.pending.get()
+            if record is None:
+                break
+            self.file.write(record)
+        self.file.flush()
+
+    def put(self, record):
+        try:
+            self.pending.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _describe(self, csp):
+        """Queue the problem record of csp and keep its indexes; return False if it was dropped."""
+        variables = list(csp.variables)
+        values = sorted({value for var in variables for value in csp.domains[var]}, key=str)
+        if len(values) > 64:
+            raise ValueError('BinaryTrace records up to 64 values per problem')
+        index = {var: k for k, var in enumerate(variables)}
+        problem = {'variables': variables, 'values': values,
+                   'neighbors': [sorted(index[Xk] for Xk in csp.neighbors[var]) for var in variables]}
+        data = json.dumps(problem, separators=(',', ':')).encode()
+        try:
+            self.pending.put_nowait(b'P' + LENGTH.pack(len(data)) + data)
+        except queue.Full:
+            return False
+        self.index = index
+        self.bits = {value: 1 << k for k, value in enumerate(values)}
+        self.problem = csp.neighbors
+        return True
+
+    def begin(self, csp):
+        run = self.calls
+        self.calls += 1
+        # a problem is known by its neighbors, that SudokuCSP shares between the boards of a shape.
+        # The calls after a dropped problem record could not be read back: they are dropped too
+        # until the record gets in
+        if csp.neighbors is not self.problem and not self._describe(csp):
+            self.dropped += 1
+            return None
+        return _BinaryRecorder(self, run, self.index, self.bits)
+
+    def close(self):
+        self.pending.put(None)
+        self.writer.join()
+        if self.own_file:
+            self.file.close()
+
+
+def _read_exactly(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError('truncated trace file')
+    return data
+
+
+def read_trace(f):
+    """Yield the calls of a binary trace file as (run, consistent, revisions, problem), the
+    revisions as (Xi, Xj, removed values, queued)."""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not an AC3 trace file')
+    problem = None
+    while True:
+        kind = f.read(1)
+        if not kind:
+            return
+        if kind == b'P':
+            (length,) = LENGTH.unpack(_read_exactly(f, LENGTH.size))
+            problem = json.loads(_read_exactly(f, length))
+        elif kind == b'R':
+            if problem is None:
+                raise ValueError('trace file without a problem record')
+            run, count = RUN.unpack(_read_exactly(f, RUN.size))
+            data = _read_exactly(f, count * EVENT.size)
+            variables, values = problem['variables'], problem['values']
+            revisions = []
+            for i, j, mask, queued in EVENT.iter_unpack(data):
+                removed = [value for k, value in enumerate(values) if mask >> k & 1]
+                revisions.append((variables[i], variables[j], removed, queued))
+            consistent = _read_exactly(f, 1) == b'\x01'
+            yield run, consistent, revisions, problem
+        else:
+            raise ValueError('bad record in trace file')
+
+
+def render(f, run=None, file=None):
+    """Print the tree of every call of the binary trace f (or only of the call run)."""
+    file = file or sys.stdout
+    shown, index = None, None
+    for number, consistent, revisions, problem in read_trace(f):
+        if run is not None and number != run:
+            continue
+        variables, neighbors = problem['variables'], problem['neighbors']
+        if problem is not shown:
+            shown, index = problem, {var: k for k, var in enumerate(variables)}
+        print('AC3 call {}{}:'.format(number, '' if consistent else ' (inconsistent)'), file=file)
+        for Xi, Xj, removed, _ in revisions:
+            print(format_revision(Xi, Xj, removed, [variables[k] for k in neighbors[index[Xi]]]), file=file)
+        print('=' * 60, file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print the AC3 tree of a binary trace file.')
+    parser.add_argument('path')
+    parser.add_argument('--run', type=int, help='only this AC3 call')
+    args = parser.parse_args(argv)
+    try:
+        with open(args.path, 'rb') as f:
+            render(f, args.run)
+    except ValueError as e:
+        print('error:', e, file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
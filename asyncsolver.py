@@ -0,0 +1,285 @@
+"""The solver for asyncio programs: solves and generations run in worker processes and are
+awaited, cancelled and followed without blocking the event loop.
+
+    async with AsyncSolver(workers=4) as pool:
+        solution, stats = await pool.solve(board, inference='mac')
+        results = await pool.solve_many(boards)
+        puzzle, solution = await pool.generate(remove=45)
+
+        job = pool.submit(board)
+        async for progress in job:          # {'nodes', 'n_bt', 'nassigns', 'depth'}
+            ...
+        solution, stats = await job
+
+The pool has its own processes, one job at a time each; the jobs wait for an idle one.
+Cancelling the awaiting task (asyncio.wait_for, task.cancel(), ...) raises a flag in the
+shared memory of the pool: the backtracking engine checks it before every choice of a
+variable and stops there. The other engines do not look at the flag, so a worker that
+has not stopped after grace seconds is killed and replaced.
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import threading
+
+import solver
+
+DONE, ERROR, CANCELLED, PROGRESS = 'done', 'error', 'cancelled', 'progress'
+
+
+class Cancelled(Exception):
+    """Raised in a worker to stop the search of a cancelled job."""
+
+
+# ______________________________________________________________________________
+# Worker processes
+
+
+class _Monitor:
+    """The monitor of solver.backtracking in a worker: stops the search when the flag of the
+    worker is raised and sends the progress every every choices."""
+
+    def __init__(self, flags, slot, job_id, results, every):
+        self.flags = flags
+        self.slot = slot
+        self.job_id = job_id
+        self.results = results
+        self.every = every
+        self.nodes = 0
+
+    def __call__(self, csp, assignment):
+        if self.flags[self.slot]:
+            raise Cancelled
+        self.nodes += 1
+        if self.nodes % self.every == 0:
+            self.results.put((self.job_id, PROGRESS, {'nodes': self.nodes, 'n_bt': csp.n_bt,
+                                                      'nassigns': csp.nassigns, 'depth': len(assignment)}))
+
+
+def _work(slot, tasks, results, flags, every):
+    while True:
+        job = tasks.get()
+        if job is None:
+            return
+        job_id, kind, options = job
+        try:
+            if kind == 'generate':
+                result = solver.generate_board(**options)
+            else:
+                if options.get('engine', 'backtracking') == 'backtracking':
+                    options['monitor'] = _Monitor(flags, slot, job_id, results, every)
+                result = solver.solve_board(**options)
+            results.put((job_id, DONE, result))
+        except Cancelled:
+            results.put((job_id, CANCELLED, None))
+        except Exception as e:
+            results.put((job_id, ERROR, e))
+
+
+# ______________________________________________________________________________
+# Event loop side
+
+
+class Job:
+    """A submitted job: await it for its result, iterate it with async for to get its progress
+    until it ends, cancel() it."""
+
+    def __init__(self, task, progress):
+        self.task = task
+        self.progress = progress
+
+    def __await__(self):
+        return self.task.__await__()
+
+    async def __aiter__(self):
+        while True:
+            item = await self.progress.get()
+            if item is None:
+                return
+            yield item
+
+    def cancel(self):
+        return self.task.cancel()
+
+    def done(self):
+        return self.task.done()
+
+
+class AsyncSolver:
+    """A pool of workers processes (os.cpu_count() by default) for the coroutines below. The
+    processes start with the first job; close() (or the end of async with) stops them."""
+
+    def __init__(self, workers=None, progress_every=1000, grace=1.0, max_progress=64):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.progress_every = progress_every
+        self.grace = grace
+        self.max_progress = max_progress
+        self.context = multiprocessing.get_context('spawn')
+        self.processes = []
+        self.tasks = []
+        self.jobs = {}
+        self.ids = itertools.count()
+        # the tasks waiting for cancelled jobs to stop
+        self.releases = set()
+        self.closing = False
+        self.loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # processes
+
+    def _spawn(self, slot):
+        process = self.context.Process(target=_work, name='asyncsolver-{}'.format(slot), daemon=True,
+                                       args=(slot, self.tasks[slot], self.results, self.flags,
+                                             self.progress_every))
+        process.start()
+        self.processes[slot] = process
+
+    def _start(self):
+        self.loop = asyncio.get_running_loop()
+        self.flags = self.context.RawArray('b', self.workers)
+        self.results = self.context.Queue()
+        self.tasks = [self.context.SimpleQueue() for _ in range(self.workers)]
+        self.processes = [None] * self.workers
+        for slot in range(self.workers):
+            self._spawn(slot)
+        self.idle = asyncio.Queue()
+        for slot in range(self.workers):
+            self.idle.put_nowait(slot)
+        self.reader = threading.Thread(target=self._read, name='asyncsolver-reader', daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        """Hand the messages of the workers to the event loop (in a thread, the queue blocks)."""
+        while True:
+            message = self.results.get()
+            if message is None:
+                return
+            self.loop.call_soon_threadsafe(self._dispatch, *message)
+
+    def _dispatch(self, job_id, kind, payload):
+        if job_id not in self.jobs:
+            return
+        future, progress, finished = self.jobs[job_id]
+        if kind == PROGRESS:
+            if progress.full():
+                progress.get_nowait()
+            progress.put_nowait(payload)
+            return
+        finished.set()
+        if not future.done():
+            if kind == DONE:
+                future.set_result(payload)
+            elif kind == ERROR:
+                future.set_exception(payload)
+            else:
+                future.cancel()
+
+    async def _run(self, kind, options, progress):
+        if self.loop is None:
+            self._start()
+        slot = await self.idle.get()
+        job_id = next(self.ids)
+        future = self.loop.create_future()
+        finished = asyncio.Event()
+        self.jobs[job_id] = (future, progress, finished)
+        self.flags[slot] = 0
+        self.tasks[slot].put((job_id, kind, options))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # the worker may have answered before the cancel reached this task: it is idle then,
+            # and the slot is given back below
+            if future.cancelled() or not future.done():
+                self.flags[slot] = 1
+                self._release(job_id, slot, stopped=False)
+            raise
+        finally:
+            # the end of the progress, that async for waits for
+            if progress.full():
+                progress.get_nowait()
+            progress.put_nowait(None)
+            if future.done() and not future.cancelled():
+                self._release(job_id, slot, stopped=True)
+
+    def _release(self, job_id, slot, stopped):
+        """Give the slot back when its worker is idle again: at once when the job ended, else when
+        the worker acknowledges the cancel, or after grace seconds with a new process."""
+        if stopped:
+            del self.jobs[job_id]
+            self.idle.put_nowait(slot)
+            return
+        finished = self.jobs[job_id][2]
+
+        async def wait():
+            try:
+                await asyncio.wait_for(finished.wait(), self.grace)
+            except asyncio.TimeoutError:
+                if self.closing:
+                    return
+                self.processes[slot].kill()
+                await self.loop.run_in_executor(None, self.processes[slot].join)
+                self.tasks[slot] = self.context.SimpleQueue()
+                self._spawn(slot)
+            del self.jobs[job_id]
+            self.idle.put_nowait(slot)
+
+        task = asyncio.ensure_future(wait())
+        self.releases.add(task)
+        task.add_done_callback(self.releases.discard)
+
+    # the API
+
+    def submit(self, board, engine='backtracking', **options):
+        """Start solving board (see solver.solve_board for engine and options) and return its Job."""
+        options.update(board=board, engine=engine)
+        progress = asyncio.Queue(self.max_progress)
+        return Job(asyncio.ensure_future(self._run('solve', options, progress)), progress)
+
+    async def solve(self, board, engine='backtracking', **options):
+        """Return (solution board or None, stats) as solver.solve_board does."""
+        return await self.submit(board, engine, **options)
+
+    async def solve_many(self, boards, engine='backtracking', **options):
+        """Return the (solution, stats) of every board, in order. If one fails or this is
+        cancelled, the other solves are cancelled."""
+        jobs = [self.submit(board, engine, **options) for board in boards]
+        try:
+            return await asyncio.gather(*(job.task for job in jobs))
+        finally:
+            for job in jobs:
+                job.cancel()
+
+    async def generate(self, remove=40):
+        """Return (puzzle, solution) as solver.generate_board does."""
+        return await self._run('generate', {'num_to_remove': remove}, asyncio.Queue(1))
+
+    async def close(self):
+        """Cancel the pending jobs and stop the processes."""
+        if self.loop is None:
+            return
+        self.closing = True
+        for slot in range(self.workers):
+            self.flags[slot] = 1
+        for future, _, _ in list(self.jobs.values()):
+            future.cancel()
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in filter(None, self.processes):
+            await self.loop.run_in_executor(None, process.join, self.grace)
+            if process.is_alive():
+                process.kill()
+        self.results.put(None)
+        # the reader is missing when _start failed
+        reader = getattr(self, 'reader', None)
+        if reader is not None:
+            await self.loop.run_in_executor(None, reader.join)
+        self.results.close()
+        for task in list(self.releases):
+            task.cancel()
+        self.loop = None
@@ -0,0 +1,100 @@
+"""The board being edited, without any GUI: values, candidates and checks of the user input.
+
+Every row, column and square keeps a bitmask of the digits it holds (bit d for the digit d),
+updated when a cell changes. Checking a digit is then three AND operations, and the
+candidates of an empty cell (its pencil marks) are the digits in none of its three masks.
+A change only alters the candidates of the cell and of its peers (same row, column or
+square), which set returns so a view redraws just these cells.
+"""
+
+import math
+
+
+class BoardModel:
+    """An n x n board (n = box * box), a list of lists of ints with 0 for an empty cell."""
+
+    # for every size, the peers of every cell as a tuple of (row, column), built once
+    peer_tables = {}
+
+    def __init__(self, board):
+        self.size = len(board)
+        self.box = math.isqrt(self.size)
+        if self.box * self.box != self.size:
+            raise ValueError('a sudoku board must be n x n with n a square number')
+        self.full = (1 << (self.size + 1)) - 2
+        if self.size not in BoardModel.peer_tables:
+            BoardModel.peer_tables[self.size] = self.build_peers()
+        self.peer_table = BoardModel.peer_tables[self.size]
+        self.load(board)
+
+    def build_peers(self):
+        n, box = self.size, self.box
+        table = []
+        for row in range(n):
+            for col in range(n):
+                top, left = row - row % box, col - col % box
+                peers = {(row, j) for j in range(n)} | {(i, col) for i in range(n)}
+                peers |= {(top + i, left + j) for i in range(box) for j in range(box)}
+                peers.discard((row, col))
+                table.append(tuple(sorted(peers)))
+        return table
+
+    def load(self, board):
+        """Replace the whole board."""
+        n = self.size
+        self.cells = [row[:] for row in board]
+        self.rows = [0] * n
+        self.cols = [0] * n
+        self.squares = [0] * n
+        for row in range(n):
+            for col in range(n):
+                value = self.cells[row][col]
+                if value:
+                    self._add(row, col, 1 << value)
+
+    def square(self, row, col):
+        return (row // self.box) * self.box + col // self.box
+
+    def _add(self, row, col, bit):
+        self.rows[row] |= bit
+        self.cols[col] |= bit
+        self.squares[self.square(row, col)] |= bit
+
+    def _remove(self, row, col, bit):
+        self.rows[row] &= ~bit
+        self.cols[col] &= ~bit
+        self.squares[self.square(row, col)] &= ~bit
+
+    def is_valid(self, num, row, col):
+        """Return true if num is in none of the row, column and square of the cell."""
+        used = self.rows[row] | self.cols[col] | self.squares[self.square(row, col)]
+        return not used >> num & 1
+
+    def set(self, row, col, value):
+        """Put value (0 to empty the cell) in the cell; return the cells whose value or
+        candidates may have changed: the cell and its peers. The masks assume that a digit is
+        only put where is_valid accepts it, as the GUI does."""
+        old = self.cells[row][col]
+        if old:
+            self._remove(row, col, 1 << old)
+        if value:
+            self._add(row, col, 1 << value)
+        self.cells[row][col] = value
+        return ((row, col),) + self.peer_table[row * self.size + col]
+
+    def get(self, row, col):
+        return self.cells[row][col]
+
+    def candidate_mask(self, row, col):
+        """The bitmask of the digits the cell can take, 0 when the cell is filled."""
+        if self.cells[row][col]:
+            return 0
+        return self.full & ~(self.rows[row] | self.cols[col] | self.squares[self.square(row, col)])
+
+    def candidates(self, row, col):
+        """The digits the cell can take (its pencil marks), in increasing order."""
+        mask = self.candidate_mask(row, col)
+        return [d for d in range(1, self.size + 1) if mask >> d & 1]
+
+    def board(self):
+        return [row[:] for row in self.cells]
@@ -0,0 +1,271 @@
+"""Headless command line, puzzles are streamed from stdin (or --input) to stdout (or --output).
+
+    python -m cli solve --inference mac < puzzles.txt > solutions.txt
+    python -m cli solve --cache solutions.db < puzzles.txt > solutions.txt
+    python -m cli generate --count 1000 --jobs 4 > new.csv
+    python -m cli produce --count 100000 --seed 7 --jobs 8 --output night.csv
+    python -m cli rate < puzzles.txt > rated.csv
+    python -m cli count --limit 2 < puzzles.txt > counted.csv
+    python -m cli bench --input puzzles.txt --heuristic mrv --inference fc
+    python -m cli startup --budget 30
+
+The --engine, --inference, --heuristic and --order names are the ones of solver.py
+(--max-steps and --seed are the options of the minconflicts engine, --max-conflicts the
+option of the sat engine).
+This module never imports tkinter, so it runs on servers without a display.
+"""
+
+import argparse
+import sys
+from timeit import default_timer as timer
+
+import solver
+from puzzleio import Puzzle, read_puzzles, write_puzzles, READERS, WRITERS
+
+# what a short-lived worker imports, and what it must not import (see startup)
+CORE_MODULES = ('csp', 'sudokucsp', 'verifier', 'solver', 'puzzleio', 'cli')
+HEAVY_MODULES = ('tkinter', 'numpy', 'utils', 'multiprocessing', 'dbm')
+
+
+def _map(function, items, jobs, chunksize=16):
+    """map function over items lazily and in order, with a pool of jobs processes when jobs > 1."""
+    if jobs <= 1:
+        yield from map(function, items)
+    else:
+        # multiprocessing is imported when needed, it costs more than the solver itself (so is
+        # statistics, in bench)
+        from multiprocessing import Pool
+        with Pool(jobs) as pool:
+            yield from pool.imap(function, items, chunksize)
+
+
+class SolveJob:
+    """A picklable function solving a Puzzle with the strategies given by name.
+
+    With cache (the path of a dbm file, or '' for memory only) the process running the job
+    opens a SolutionCache on its first puzzle: a board seen before, up to a relabeling or a
+    symmetry, is answered from it without searching and gets meta['cached'] = True."""
+
+    def __init__(self, engine, options, measure_memory=False, cache=None):
+        self.engine = engine
+        self.options = options
+        self.measure_memory = measure_memory
+        self.cache = cache
+        self.solutions = None
+
+    def __getstate__(self):
+        # every worker opens its own cache
+        return dict(self.__dict__, solutions=None)
+
+    def __call__(self, puzzle):
+        start = timer()
+        if self.cache is None:
+            solution, stats = solver.solve_board(puzzle.board, self.engine, self.measure_memory, **self.options)
+        else:
+            if self.solutions is None:
+                from solutioncache import SolutionCache
+                self.solutions = SolutionCache(path=self.cache)
+            stats = {'cached': True}
+
+            def search(board):
+                solution, found = solver.solve_board(board, self.engine, self.measure_memory, **self.options)
+                stats.update(found, cached=False)
+                return solution
+
+            solution = self.solutions.solve(puzzle.board, search)
+        puzzle.solution = solution
+        puzzle.meta.update(stats)
+        puzzle.meta['seconds'] = round(timer() - start, 6)
+        return puzzle
+
+    def close(self):
+        if self.solutions is not None:
+            self.solutions.close()
+            self.solutions = None
+
+
+def rate_job(puzzle):
+    solution, meta = solver.rate_board(puzzle.board)
+    if puzzle.solution is None:
+        puzzle.solution = solution
+    puzzle.meta.update(meta)
+    return puzzle
+
+
+def count_job(puzzle, limit=2):
+    puzzle.meta['solutions'] = solver.count_solutions(puzzle.board, limit)
+    return puzzle
+
+
+def generate_job(num_to_remove):
+    puzzle, solution = solver.generate_board(num_to_remove)
+    return Puzzle(puzzle, solution)
+
+
+def _engine_options(args):
+    options = {}
+    if args.engine == 'backtracking':
+        options = {'inference': args.inference, 'heuristic': args.heuristic, 'order': args.order}
+    elif args.engine == 'minconflicts':
+        options = {'max_steps': args.max_steps, 'seed': args.seed}
+    elif args.engine == 'sat':
+        options = {'max_conflicts': args.max_conflicts}
+    return options
+
+
+def solve(args):
+    unsolved = 0
+
+    def answers(puzzles):
+        nonlocal unsolved
+        for index, puzzle in enumerate(puzzles):
+            if puzzle.solution is None:
+                unsolved += 1
+                print('puzzle {} has no solution'.format(index), file=sys.stderr)
+            elif args.to != 'csv':
+                # lines and grids get the solution in place of the puzzle
+                puzzle.board = puzzle.solution
+            yield puzzle
+
+    if args.cache and args.jobs > 1:
+        # a dbm file has one writer at a time
+        raise ValueError('--cache needs --jobs 1')
+    job = SolveJob(args.engine, _engine_options(args), args.memory, args.cache)
+    try:
+        write_puzzles(answers(_map(job, read_puzzles(args.input, args.format), args.jobs)), args.output, args.to)
+    finally:
+        job.close()
+    return 1 if unsolved else 0
+
+
+def rate(args):
+    write_puzzles(_map(rate_job, read_puzzles(args.input, args.format), args.jobs), args.output, args.to or 'csv')
+    return 0
+
+
+def count(args):
+    import functools
+    job = functools.partial(count_job, limit=args.limit or None)
+    write_puzzles(_map(job, read_puzzles(args.input, args.format), args.jobs), args.output, args.to or 'csv')
+    return 0
+
+
+def generate(args):
+    write_puzzles(_map(generate_job, [args.remove] * args.count, args.jobs), args.output, args.to or 'csv')
+    return 0
+
+
+def produce(args):
+    import production
+    stats = {}
+    puzzles = production.produce(args.count, args.seed, args.remove, args.start, args.jobs, stats=stats)
+    written = write_puzzles(puzzles, args.output, args.to or 'csv')
+    print('{} puzzles written, {} duplicates dropped'.format(written, stats['duplicates']), file=sys.stderr)
+    return 0
+
+
+def bench(args):
+    import statistics
+    job = SolveJob(args.engine, _engine_options(args), args.memory)
+    seconds, backtracks, peaks = [], [], []
+    start = timer()
+    for puzzle in _map(job, read_puzzles(args.input, args.format), args.jobs):
+        seconds.append(puzzle.meta['seconds'])
+        backtracks.append(puzzle.meta.get('n_bt', 0))
+        peaks.append(puzzle.meta.get('peak_bytes', 0))
+    total = timer() - start
+    if not seconds:
+        print('no puzzles', file=sys.stderr)
+        return 1
+    print('engine: {} {}'.format(args.engine, ' '.join('{}={}'.format(k, v) for k, v in _engine_options(args).items())))
+    print('puzzles: {}  wall time: {:.3f} s  ({:.1f} puzzles/s)'.format(len(seconds), total, len(seconds) / total))
+    print('time per puzzle: mean {:.6f} s  median {:.6f} s  max {:.6f} s'.format(
+        statistics.mean(seconds), statistics.median(seconds), max(seconds)))
+    print('backtracks: mean {:.1f}  max {}'.format(statistics.mean(backtracks), max(backtracks)))
+    if args.memory:
+        print('peak memory per solve: mean {:.0f} bytes  max {} bytes'.format(statistics.mean(peaks), max(peaks)))
+    return 0
+
+
+def _run_python(code):
+    import subprocess
+    start = timer()
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=sys.path[0] or None)
+    return timer() - start, result.stdout.strip()
+
+
+def startup(args):
+    """Time the import of the core modules in fresh interpreters (best of --repeat, minus the
+    time of an empty interpreter) and fail when it is over --budget milliseconds or when an
+    optional heavy module gets imported."""
+    code = 'import sys, {}; print(" ".join(m for m in {!r} if m in sys.modules))'.format(
+        ', '.join(CORE_MODULES), HEAVY_MODULES)
+    empty = min(_run_python('pass')[0] for _ in range(args.repeat))
+    runs = [_run_python(code) for _ in range(args.repeat)]
+    milliseconds = (min(seconds for seconds, _ in runs) - empty) * 1000
+    heavy = runs[0][1]
+    print('core import: {:.1f} ms (budget {} ms)'.format(milliseconds, args.budget))
+    if heavy:
+        print('optional modules imported by the core: ' + heavy)
+    return 1 if heavy or milliseconds > args.budget else 0
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog='python -m cli', description='Sudoku solver without a GUI.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add(name, function, help, reads=True, solves=False):
+        command = commands.add_parser(name, help=help)
+        command.set_defaults(function=function)
+        if reads:
+            command.add_argument('--input', default='-', help='puzzle file, - for stdin (default)')
+            command.add_argument('--format', choices=sorted(READERS), help='input format (default: from the file name)')
+        command.add_argument('--output', default='-', help='output file, - for stdout (default)')
+        command.add_argument('--to', choices=sorted(WRITERS), help='output format')
+        command.add_argument('--jobs', type=int, default=1, help='worker processes (default 1)')
+        if solves:
+            command.add_argument('--engine', choices=sorted(solver.ENGINES), default='backtracking')
+            command.add_argument('--inference', choices=sorted(solver.INFERENCES), default='fc')
+            command.add_argument('--heuristic', choices=sorted(solver.HEURISTICS), default='mrv')
+            command.add_argument('--order', choices=sorted(solver.ORDERS), default='unordered')
+            command.add_argument('--max-steps', type=int, default=100000, help='swaps of minconflicts (default 100000)')
+            command.add_argument('--seed', type=int, help='random seed of minconflicts')
+            command.add_argument('--max-conflicts', type=int, help='give up the sat engine after this many conflicts')
+            command.add_argument('--memory', action='store_true', help='record the peak memory of every solve')
+        return command
+
+    command = add('solve', solve, 'solve the puzzles', solves=True)
+    command.add_argument('--cache', help='dbm file of the solutions, repeated boards are answered from it '
+                                         '(with --jobs 1)')
+    add('rate', rate, 'add the clues and difficulty of the puzzles')
+    add('bench', bench, 'time the solver on the puzzles', solves=True)
+    command = add('count', count, 'count the solutions of the puzzles')
+    command.add_argument('--limit', type=int, default=2, help='stop counting there, 0 for no limit (default 2: '
+                                                              'unique puzzles get 1, broken ones 0)')
+    command = add('generate', generate, 'generate new puzzles', reads=False)
+    command.add_argument('--count', type=int, default=1)
+    command.add_argument('--remove', type=int, default=40, help='cells to empty (default 40)')
+    command = add('produce', produce, 'make unique rated puzzles, reproducible from --seed', reads=False)
+    command.add_argument('--count', type=int, default=1, help='puzzles to make (fewer are written if some repeat)')
+    command.add_argument('--seed', type=int, default=0)
+    command.add_argument('--start', type=int, default=0, help='index of the first puzzle of the run')
+    command.add_argument('--remove', type=int, default=55, help='cells to empty at most (default 55)')
+    command = commands.add_parser('startup', help='check the import time of the core against a budget')
+    command.set_defaults(function=startup)
+    command.add_argument('--budget', type=float, default=30, help='milliseconds (default 30)')
+    command.add_argument('--repeat', type=int, default=5)
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    try:
+        return args.function(args)
+    except ValueError as e:
+        print('error:', e, file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,6 +4,11 @@
 # the proof about performance can be found in the files original_results.txt and modified_results.txt
 # @modified: removed unused imports
 
+import warnings
+from array import array
+from bisect import bisect_left
+from types import MappingProxyType
+
 
 class CSP:
     """This class describes finite-domain Constraint Satisfaction Problems.
@@ -13,7 +18,8 @@ class CSP:
         neighbors   A dict of {var:[var,...]} that for each variable lists
                     the other variables that participate in constraints.
         constraints A function f(A, a, B, b) that returns true if neighbors
-                    A, B satisfy the constraint when they have values A=a, B=b
+                    A, B satisfy the constraint when they have values A=a, B=b,
+                    or declared kinds (see NotEqual, AllDifferent, Sum and Table)
 
     In the textbook and in most mathematical definitions, the
     constraints are specified as explicit pairs of allowable values,
@@ -33,6 +39,13 @@ class CSP:
                                 conflict with var=val
         curr_domains[var]       Slot: remaining consistent values for var
                                 Used by constraint propagation routines.
+        support                 Slot: optional counts kept by subclasses so that
+                                nsupports(var, val) is a lookup (used by lcv)
+        not_equal               Slot: true if the neighbors must differ, revise,
+                                forward_checking and nconflicts then compare the
+                                values without calling constraints
+        nary, var_nary          Slot: the Sum and Table constraints, and for every
+                                variable the indexes of the ones it is in
     The following methods are used only by graph_search and tree_search:
         actions(state)          Return a list of actions
         result(state, action)   Return a successor of state
@@ -40,22 +53,96 @@ class CSP:
     The following are just for debugging purposes:
         nassigns                Slot: tracks the number of assignments made
         display(a)              Print a human-readable representation
+
+    The slots in STATE are the state of one search, the others define the problem.
+    context() returns a CSP sharing the definition with a new state: freeze() the
+    problem once, then every search (thread, request, forked worker) runs on its own
+    context, which costs a few references instead of building the problem again.
     """
 
+    # the slots keep the instances small, a process pool holds one per solve
+    __slots__ = ('variables', 'domains', 'neighbors', 'constraints', 'initial', 'curr_domains', 'support',
+                 'nassigns', 'n_bt', 'graph', 'not_equal', 'nary', 'var_nary', 'frozen')
+    STATE = ('curr_domains', 'support', 'nassigns', 'n_bt')
+
 # added a variable to save the number of backtracks
 # in my opinion it is better to show the backtracks instead of the assignments
+# @Modified: constraints can also be declared: NotEqual() (or different_values_constraint, the same
+#            relation) for the neighbors, or a list of AllDifferent, Sum and Table. With a list the
+#            neighbors given (None for none) are extra not-equal pairs, the pairs of the AllDifferent
+#            are added to them (see declare)
     def __init__(self, variables, domains, neighbors, constraints):
         """Construct a CSP problem. If variables is empty, it becomes domains.keys()."""
         variables = variables or list(domains.keys())
         self.variables = variables
         self.domains = domains
+        self.nary = ()
+        self.var_nary = {}
+        self.not_equal = constraints is different_values_constraint or isinstance(constraints, NotEqual)
+        if isinstance(constraints, (list, tuple)):
+            neighbors = self.declare(constraints, neighbors)
+            self.not_equal = True
+        if self.not_equal:
+            constraints = different_values_constraint
         self.neighbors = neighbors
         self.constraints = constraints
         self.initial = ()
+        self.graph = None
+        self.frozen = False
+        self.reset()
+
+    # @Added: the problem and the state of a search apart
+
+    def reset(self):
+        """Forget the state of the search (subclasses reset their own STATE slots too)."""
         self.curr_domains = None
+        self.support = None
         self.nassigns = 0
         self.n_bt = 0
 
+    def freeze(self):
+        """Make the definition read only, so that it can be shared: the domains become a read-only
+        mapping of tuples and searching the problem itself raises ValueError (search a context)."""
+        if not self.frozen:
+            self.domains = MappingProxyType({var: tuple(self.domains[var]) for var in self.variables})
+            self.constraint_graph()
+            self.reset()
+            self.frozen = True
+        return self
+
+    def context(self):
+        """Return a new CSP of the same class for one search: the definition is shared, the
+        state is new. The contexts of a frozen problem are not frozen."""
+        self.constraint_graph()
+        cls = type(self)
+        context = cls.__new__(cls)
+        for klass in cls.__mro__:
+            for slot in getattr(klass, '__slots__', ()):
+                if slot not in cls.STATE and hasattr(self, slot):
+                    setattr(context, slot, getattr(self, slot))
+        context.frozen = False
+        context.reset()
+        return context
+
+    def declare(self, constraints, neighbors=None):
+        """Add the Sum and Table constraints to self.nary, and their indexes to self.var_nary for the
+        variables of their scope, and return the neighbors as a dict of sets: the pairs of the
+        AllDifferent added to the neighbors given, which are not-equal pairs too."""
+        peers = {var: set(neighbors[var]) if neighbors else set() for var in self.variables}
+        nary = list(self.nary)
+        for constraint in constraints:
+            if isinstance(constraint, AllDifferent):
+                for var in constraint.scope:
+                    peers[var].update(other for other in constraint.scope if other != var)
+            elif isinstance(constraint, (Sum, Table)):
+                for var in constraint.scope:
+                    self.var_nary.setdefault(var, []).append(len(nary))
+                nary.append(constraint)
+            elif not isinstance(constraint, NotEqual):
+                raise ValueError('unknown constraint kind: {!r}'.format(constraint))
+        self.nary = tuple(nary)
+        return peers
+
     def reduce_domains(self):
         """Perform initial domain reduction based on unary constraints."""
         for var in self.variables:
@@ -79,19 +166,34 @@ class CSP:
             del assignment[var]
 
 # @Modified: the original used a recursive function, in my opinion this one looks better
-#            and is easier to understand
+#            and is easier to understand. The neighbors come from the constraint graph
 
     def nconflicts(self, var, val, assignment):
         """Return the number of conflicts var=val has with other variables."""
         count = 0
-        for var2 in self.neighbors.get(var):
-            val2 = None
-            if assignment.__contains__(var2):
-                val2 = assignment[var2]
-            if val2 is not None and self.constraints(var, val, var2, val2) is False:
+        if self.not_equal:
+            for var2 in self.constraint_graph().peers[var]:
+                if assignment.get(var2) == val:
+                    count += 1
+        else:
+            for var2 in self.constraint_graph().peers[var]:
+                val2 = None
+                if assignment.__contains__(var2):
+                    val2 = assignment[var2]
+                if val2 is not None and self.constraints(var, val, var2, val2) is False:
+                    count += 1
+        for c in self.var_nary.get(var, ()):
+            if not self.nary[c].allows(self, var, val, assignment):
                 count += 1
         return count
 
+    def constraint_graph(self):
+        """Return the ConstraintGraph of the neighbors, built on the first call (subclasses can
+        set self.graph to a shared one)."""
+        if self.graph is None:
+            self.graph = ConstraintGraph(self.variables, self.neighbors)
+        return self.graph
+
     def display(self, assignment):
         """Show a human-readable representation of the CSP."""
         # Subclasses can print in a prettier way, or display with a GUI
@@ -110,6 +212,8 @@ class CSP:
         """Make sure we can prune values from domains. (We want to pay
         for this only if we use it.)"""
         if self.curr_domains is None:
+            if self.frozen:
+                raise ValueError('a frozen problem is shared, search a context of it (csp.context())')
             self.curr_domains = {v: list(self.domains[v]) for v in self.variables}
 
     def suppose(self, var, value):
@@ -135,56 +239,129 @@ class CSP:
             self.curr_domains[B].append(b)
 
 
+# ______________________________________________________________________________
+# @Added: the neighbors compiled once into arrays
+
+class ConstraintGraph:
+    """The neighbors of a CSP in compressed sparse row form, variables and arcs numbered:
+        variables               the variables, the variable i is variables[i]
+        index                   {var: i}
+        offsets, targets        the neighbors of i are targets[offsets[i]:offsets[i + 1]], in
+                                increasing order; the arc (i, targets[a]) has the id a
+        sources                 sources[a] is the i of the arc a
+        in_offsets, in_arcs     the ids of the arcs (k, i) are in_arcs[in_offsets[i]:in_offsets[i + 1]]
+        peers                   {var: tuple of the neighbor variables}, in the same order
+    The arrays are read only and can be shared by all the CSPs with the same neighbors."""
+
+    def __init__(self, variables, neighbors):
+        self.variables = tuple(variables)
+        index = self.index = {var: i for i, var in enumerate(self.variables)}
+        offsets, targets, sources = array('i', [0]), array('i'), array('i')
+        incoming = [[] for _ in self.variables]
+        for i, var in enumerate(self.variables):
+            for j in sorted(index[B] for B in neighbors[var]):
+                incoming[j].append(len(targets))
+                targets.append(j)
+                sources.append(i)
+            offsets.append(len(targets))
+        in_offsets, in_arcs = array('i', [0]), array('i')
+        for arcs in incoming:
+            in_arcs.extend(arcs)
+            in_offsets.append(len(in_arcs))
+        self.offsets, self.targets, self.sources = offsets, targets, sources
+        self.in_offsets, self.in_arcs = in_offsets, in_arcs
+        self.peers = {var: tuple(self.variables[j] for j in targets[offsets[i]:offsets[i + 1]])
+                      for i, var in enumerate(self.variables)}
+
+    def __len__(self):
+        """The number of arcs."""
+        return len(self.targets)
+
+    def arc(self, Xi, Xj):
+        """Return the id of the arc (Xi, Xj); Xj must be a neighbor of Xi."""
+        i, j = self.index[Xi], self.index[Xj]
+        return bisect_left(self.targets, j, self.offsets[i], self.offsets[i + 1])
+
+    def arcs_into(self, var):
+        """Return the ids of the arcs (Xk, var)."""
+        i = self.index[var]
+        return self.in_arcs[self.in_offsets[i]:self.in_offsets[i + 1]].tolist()
+
+
 # ______________a________________________________________________________________
 # Constraint Propagation with AC-3
 
-def AC3(csp, queue=None, removals=None, display_tree=True):
-    """[Figure 6.3]"""
+# @Modified: the tree of removed values and added arcs was built in a dict and printed at the end
+#            of every call, now the revisions go to a trace sink (see ac3trace.py) and nothing is
+#            recorded without one.
+#            The queue holds arc ids of the constraint graph instead of tuples of names, and an arc
+#            already in the queue is not added again (the original queued all the arcs (Xk, Xi) after
+#            every revision, duplicates included).
+#            display_tree is deprecated: True prints the tree of the call as before, with the sink
+#            ac3trace.PrintTrace; trace is keyword only so that AC3(csp, queue, removals, True) keeps
+#            its meaning
+def AC3(csp, queue=None, removals=None, display_tree=False, *, trace=None):
+    """[Figure 6.3] queue is a list of arcs (Xi, Xj) or of arc ids of csp.constraint_graph(),
+    all the arcs if None."""
+    if display_tree:
+        warnings.warn('AC3(display_tree=True) is deprecated, give a sink of ac3trace.py as trace',
+                      DeprecationWarning, stacklevel=2)
+        if trace is None:
+            from ac3trace import PrintTrace
+            trace = PrintTrace()
+    graph = csp.constraint_graph()
     if queue is None:
-        queue = [(Xi, Xk) for Xi in csp.variables for Xk in csp.neighbors[Xi]]
+        queue = list(range(len(graph)))
+    elif queue and type(queue[0]) is not int:
+        queue = [graph.arc(Xi, Xj) for Xi, Xj in queue]
     csp.support_pruning()
-
-    ac3_tree = {}  # to store information about removed values and added arcs in the AC3 tree
-
-    def add_to_tree(Xi, Xj, removed_values, added_arcs):
-        if display_tree:
-            ac3_tree[(Xi, Xj)] = {'removed_values': removed_values, 'added_arcs': added_arcs}
+    trace = trace or AC3_TRACE
+    if trace is not None:
+        trace = trace.begin(csp)
+    variables, sources, targets = graph.variables, graph.sources, graph.targets
+    in_offsets, in_arcs = graph.in_offsets, graph.in_arcs
+    queued = bytearray(len(targets))
+    for a in queue:
+        queued[a] = 1
 
     while queue:
-        (Xi, Xj) = queue.pop()
-
+        a = queue.pop()
+        queued[a] = 0
+        i = sources[a]
+        Xi, Xj = variables[i], variables[targets[a]]
+        if trace is not None:
+            before = csp.curr_domains[Xi][:]
         if revise(csp, Xi, Xj, removals):
-            removed_values = set(csp.domains[Xi]) - set(csp.curr_domains[Xi])
-            added_arcs = []
             if not csp.curr_domains[Xi]:
+                if trace is not None:
+                    trace.revised(Xi, Xj, before, len(queue))
+                    trace.end(False)
                 return False
-            for Xk in csp.neighbors[Xi]:
-                if Xk != Xi:
-                    queue.append((Xk, Xi))
-                    added_arcs.append(((Xk, Xi)))
-            add_to_tree(Xi, Xj, removed_values, added_arcs)
-            #print(queue)
-
-    if display_tree:
-        print("============================================================\n")
-        print_ac3_tree(ac3_tree)
-
+            for b in in_arcs[in_offsets[i]:in_offsets[i + 1]]:
+                if not queued[b]:
+                    queued[b] = 1
+                    queue.append(b)
+            if trace is not None:
+                trace.revised(Xi, Xj, [x for x in before if x not in csp.curr_domains[Xi]], len(queue))
+
+    if trace is not None:
+        trace.end(True)
     return True
 
-def print_ac3_tree(tree):
-    """Print a human-readable representation of the AC3 tree."""
-    print("AC3 Tree:")
-    for (Xi, Xj), info in tree.items():
-        removed_values = info['removed_values']
-        added_arcs = info['added_arcs']
-        print(f"{Xi} -> {Xj}: Removed {removed_values}, Queue {added_arcs}")
-        print("============================================================\n")
-
 
+# the sink of the AC3 calls that do not give one (mac), None to record nothing
+AC3_TRACE = None
 
 
+# @Modified: with not-equal constraints Xi=x has no support only when x is the last value of Xj
 def revise(csp, Xi, Xj, removals):
     """Return true if we remove a value."""
+    if csp.not_equal:
+        values = csp.curr_domains[Xj]
+        if len(values) == 1 and values[0] in csp.curr_domains[Xi]:
+            csp.prune(Xi, values[0], removals)
+            return True
+        return False
     revised = False
     for x in csp.curr_domains[Xi][:]:
         # If Xi=x conflicts with Xj=y for every possible y, eliminate Xi=x
@@ -241,10 +418,15 @@ def unordered_domain_values(var, assignment, csp):
     return csp.choices(var)
 
 
+# @Modified: the original always sorted with nconflicts, that is a scan of all the neighbors for every value.
+#            When the csp keeps support counts (see SudokuCSP) the value that is still allowed by the
+#            fewest neighbors rules out the fewest choices, and ranking it is just a lookup
 def lcv(var, assignment, csp):
     """Least-constraining-values heuristic."""
-    return sorted(csp.choices(var),
-                  key=lambda val: csp.nconflicts(var, val, assignment))
+    if csp.support is None:
+        return sorted(csp.choices(var),
+                      key=lambda val: csp.nconflicts(var, val, assignment))
+    return sorted(csp.choices(var), key=lambda val: csp.nsupports(var, val))
 
 
 # Inference
@@ -254,21 +436,52 @@ def no_inference(csp, var, value, assignment, removals):
     return True
 
 
+# @Modified: the neighbors are read from the constraint graph, a tuple in a fixed order instead of a set
+#            whose order changes with the hash seed of every run (and so did the search).
+#            With not-equal constraints only value itself is removed from the neighbors, and the Sum and
+#            Table constraints of var prune the rest of their scope
 def forward_checking(csp, var, value, assignment, removals):
     """Prune neighbor values inconsistent with var=value."""
-    for B in csp.neighbors[var]:
-        if B not in assignment:
-            for b in csp.curr_domains[B][:]:
-                if not csp.constraints(var, value, B, b):
-                    csp.prune(B, b, removals)
-            if not csp.curr_domains[B]:
-                return False
+    if csp.not_equal:
+        for B in csp.constraint_graph().peers[var]:
+            if B not in assignment and value in csp.curr_domains[B]:
+                csp.prune(B, value, removals)
+                if not csp.curr_domains[B]:
+                    return False
+    else:
+        for B in csp.constraint_graph().peers[var]:
+            if B not in assignment:
+                for b in csp.curr_domains[B][:]:
+                    if not csp.constraints(var, value, B, b):
+                        csp.prune(B, b, removals)
+                if not csp.curr_domains[B]:
+                    return False
+    return propagate_nary(csp, var, assignment, removals)
+
+
+def propagate_nary(csp, var, assignment, removals):
+    """Prune the values of the Sum and Table constraints of var left without support by the
+    assignment; return false if a domain becomes empty."""
+    for c in csp.var_nary.get(var, ()):
+        if not csp.nary[c].prune(csp, assignment, removals):
+            return False
     return True
 
 
+# @Modified: the Sum and Table constraints of var are propagated first, then the arcs into var and
+#            into the variables they pruned are revised
 def mac(csp, var, value, assignment, removals):
     """Maintain arc consistency."""
-    return AC3(csp, [(X, var) for X in csp.neighbors[var]], removals, True)
+    graph = csp.constraint_graph()
+    if var not in csp.var_nary:
+        return AC3(csp, graph.arcs_into(var), removals)
+    start = len(removals)
+    if not propagate_nary(csp, var, assignment, removals):
+        return False
+    queue = graph.arcs_into(var)
+    for B in {B for B, _ in removals[start:]}:
+        queue += graph.arcs_into(B)
+    return AC3(csp, queue, removals)
 
 # The search, proper
 
@@ -305,7 +518,152 @@ def backtracking_search(csp,
     return result
 
 
+# @Added: all the solutions from a single search. After a solution the search goes on from the deepest
+#         choice, with the same assignment and the same removals, instead of starting again with the
+#         solutions found so far excluded
+
+
+def backtracking_solutions(csp,
+                           select_unassigned_variable,
+                           order_domain_values,
+                           inference):
+    """Yield every solution of csp (a new dict each time), lazily: the search only goes on when
+    the next one is asked for, so islice or a break stops it."""
+    def backtrack(assignment):
+        if len(assignment) == len(csp.variables):
+            yield dict(assignment)
+            return
+        var = select_unassigned_variable(assignment, csp)
+        for value in order_domain_values(var, assignment, csp):
+            if 0 == csp.nconflicts(var, value, assignment):
+                csp.assign(var, value, assignment)
+                removals = csp.suppose(var, value)
+                if inference(csp, var, value, assignment, removals):
+                    found = False
+                    for solution in backtrack(assignment):
+                        found = True
+                        yield solution
+                    if not found:
+                        csp.n_bt += 1
+                csp.restore(removals)
+        csp.unassign(var, assignment)
+
+    for solution in backtrack({}):
+        assert csp.goal_test(solution)
+        yield solution
+
+
 def different_values_constraint(A, a, B, b):
     """A constraint saying two neighboring variables must differ in value."""
     return a != b
 
+
+# ______________________________________________________________________________
+# @Added: declared constraints. The search recognizes them and checks them with its own code
+#         instead of calling a function for every pair of values
+
+
+class NotEqual:
+    """The neighbors hold different values (different_values_constraint)."""
+
+    def __repr__(self):
+        return 'NotEqual()'
+
+
+class AllDifferent:
+    """The variables of scope hold different values: they are neighbors of each other."""
+
+    def __init__(self, scope):
+        self.scope = tuple(scope)
+
+    def __repr__(self):
+        return 'AllDifferent({!r})'.format(self.scope)
+
+
+class Sum:
+    """The values of the variables of scope add up to total (ints, or digit strings as in SudokuCSP)."""
+
+    def __init__(self, scope, total):
+        self.scope = tuple(scope)
+        self.total = total
+
+    def __repr__(self):
+        return 'Sum({!r}, {!r})'.format(self.scope, self.total)
+
+    def _bounds(self, csp, assignment, skip=None):
+        """Return (assigned sum, least and greatest sums of the other unassigned variables but skip)."""
+        domains = csp.curr_domains or csp.domains
+        fixed = low = high = 0
+        for var in self.scope:
+            if var in assignment:
+                fixed += int(assignment[var])
+            elif var != skip:
+                values = [int(val) for val in domains[var]]
+                if not values:
+                    return fixed, None, None
+                low += min(values)
+                high += max(values)
+        return fixed, low, high
+
+    def allows(self, csp, var, val, assignment):
+        """Return true if var=val can still reach the total with the domains of the rest."""
+        fixed, low, high = self._bounds(csp, _with(assignment, var, val))
+        return low is not None and fixed + low <= self.total <= fixed + high
+
+    def prune(self, csp, assignment, removals):
+        """Prune the values out of the bounds the rest of the scope leaves; false if a domain empties."""
+        for var in self.scope:
+            if var in assignment:
+                continue
+            fixed, low, high = self._bounds(csp, assignment, var)
+            if low is None:
+                return False
+            for val in [val for val in csp.curr_domains[var]
+                        if not fixed + low <= self.total - int(val) <= fixed + high]:
+                csp.prune(var, val, removals)
+            if not csp.curr_domains[var]:
+                return False
+        return True
+
+
+class Table:
+    """The values of the variables of scope form one of the tuples of allowed."""
+
+    def __init__(self, scope, allowed):
+        self.scope = tuple(scope)
+        self.allowed = tuple(tuple(row) for row in allowed)
+
+    def __repr__(self):
+        return 'Table({!r}, {} tuples)'.format(self.scope, len(self.allowed))
+
+    def _matching(self, assignment):
+        """The allowed tuples that agree with the assigned variables of the scope."""
+        fixed = [(k, assignment[var]) for k, var in enumerate(self.scope) if var in assignment]
+        return [row for row in self.allowed if all(row[k] == val for k, val in fixed)]
+
+    def allows(self, csp, var, val, assignment):
+        """Return true if an allowed tuple agrees with var=val and the assigned variables."""
+        return bool(self._matching(_with(assignment, var, val)))
+
+    def prune(self, csp, assignment, removals):
+        """Prune the values that no tuple agreeing with the assignment has; false if a domain empties."""
+        rows = self._matching(assignment)
+        for k, var in enumerate(self.scope):
+            if var in assignment:
+                continue
+            supported = {row[k] for row in rows}
+            for val in [val for val in csp.curr_domains[var] if val not in supported]:
+                csp.prune(var, val, removals)
+            if not csp.curr_domains[var]:
+                return False
+        return True
+
+
+def _with(assignment, var, val):
+    """The assignment with var=val, a copy if var=val is not in it."""
+    if assignment.get(var) == val:
+        return assignment
+    assignment = dict(assignment)
+    assignment[var] = val
+    return assignment
+
@@ -2,11 +2,15 @@ from tkinter import *
 from timeit import default_timer as timer
 from tkinter import messagebox, simpledialog
 import threading
-import copy
+import os
 
-from sudokucsp import SudokuCSP
+from solutioncache import SolutionCache
+from puzzlebank import PuzzleBank
 import SudokoGenarator
-from csp import backtracking_search, mrv, unordered_domain_values, forward_checking, mac, no_inference
+from csp import mrv, unordered_domain_values, lcv, forward_checking, mac, no_inference
+from presolver import format_trace
+from boardmodel import BoardModel
+from session import SolveSession
 
 size = 9  # Size of the Sudoku board
 MARGIN = 20  # Pixels around the board
@@ -14,13 +18,36 @@ SIDE = 50  # Width of every board cell
 WIDTH_B = HEIGHT_B = MARGIN * 2 + SIDE * size  # Width and height of the whole board
 WIDTH = WIDTH_B + 180  # Width of board and buttons solve and reset
 
+# puzzles already solved (up to relabeling, rotation and row/band swaps) are answered from here
+solution_cache = SolutionCache()
+
+# when this file exists the boards are picked from it (see puzzlebank.py), otherwise they are generated
+PUZZLE_BANK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'puzzles.bank')
+# difficulty (backtracks of MRV + FC) of the boards picked for every level
+LEVELS = {1: (0, 10), 2: (11, 0xFFFF)}
+# milliseconds between two looks at a running solvability check
+CHECK_POLL = 50
+
 
 class SudokuUI(Frame):
 
     def __init__(self, parent):
         self.parent = parent
         self.original_board = [[0 for _ in range(size)] for _ in range(size)]
-        self.current_board = copy.deepcopy(self.original_board)
+        # the values and candidates of the board being edited, current_board is its list of lists
+        self.model = BoardModel(self.original_board)
+        self.current_board = self.model.cells
+        # the last solution and domains of the edited board, see session.py
+        self.session = SolveSession(self.original_board)
+        # the thread of the solvability check running after an edit, None when there is none
+        self.checking = None
+        self.bank = None
+        if os.path.exists(PUZZLE_BANK):
+            try:
+                self.bank = PuzzleBank(PUZZLE_BANK)
+            except ValueError as e:
+                # a broken bank is ignored, the boards are generated
+                print(e)
         Frame.__init__(self, parent)
         self.row, self.col = 0, 0
         self.__initUI()
@@ -38,6 +65,9 @@ class SudokuUI(Frame):
         self.time.set("Time:                    ")
         self.n_bt = StringVar()
         self.n_bt.set("N. BT:   ")
+        self.logic = StringVar()
+        self.logic.set("Logic:   ")
+        self.pencil = BooleanVar(value=False)
 
         self.make_menu()
 
@@ -55,6 +85,7 @@ class SudokuUI(Frame):
         lbltime.grid(row=30, column=0)
 
         lblBT.grid(row=32, column=0)
+        Label(self, textvariable=self.logic).grid(row=34, column=0, columnspan=60, sticky=W)
         self.inference = StringVar()
         self.radio = []
         self.radio.append(Radiobutton(self, text="No Inference", variable=self.inference, value="NO_INFERENCE"))
@@ -76,6 +107,17 @@ class SudokuUI(Frame):
 
         self.var_to_choose.set("MRV")
 
+        Label(self, text="Value order:          ").grid(row=21, column=61)
+        self.value_order = StringVar()
+        self.radio.append(Radiobutton(self, text="Unordered", variable=self.value_order, value="UNORDERED"))
+        self.radio[4].grid(row=22, column=62)
+        self.radio.append(Radiobutton(self, text="LCV          ", variable=self.value_order, value="LCV"))
+        self.radio[5].grid(row=23, column=62)
+        self.value_order.set("UNORDERED")
+
+        # the candidates of the empty cells, from the masks of the model
+        Checkbutton(self, text="Pencil marks", variable=self.pencil, command=self.__draw_cells).grid(row=25, column=61)
+
         self.__draw_grid()
         self.__draw_puzzle()
 
@@ -93,7 +135,6 @@ class SudokuUI(Frame):
         messagebox.showinfo("Working", "We are looking for a solution, please wait some seconds ...")
 
     def solve_sudoku(self):
-        s = SudokuCSP(self.current_board)
         inf, dv, suv = None, None, None
 
         if self.inference.get() == "NO_INFERENCE":
@@ -106,22 +147,37 @@ class SudokuUI(Frame):
         if self.var_to_choose.get() == "MRV":
             suv = mrv
 
-        start = timer()
-        a = backtracking_search(s, select_unassigned_variable=suv, order_domain_values=unordered_domain_values,
-                                inference=inf)
-        end = timer()
-
-        if a:
-            for i in range(size):
-                for j in range(size):
-                    index = i * size + j
-                    self.current_board[i][j] = a.get("CELL" + str(index))
+        if self.value_order.get() == "UNORDERED":
+            dv = unordered_domain_values
+        elif self.value_order.get() == "LCV":
+            dv = lcv
+
+        # the time shown is the one of the search, not of the lookup in the cache (0 on a hit)
+        searched = {'n_bt': 0, 'trace': [], 'time': 0}
+
+        def search(board):
+            # the session answers at once while its last solution agrees with the board, otherwise
+            # it runs the techniques first and the search only gets what they could not finish
+            start = timer()
+            solution = self.session.solve(suv, dv, inf, logic=True)
+            end = timer()
+            searched['time'] = end - start
+            if self.session.csp is not None:
+                searched['n_bt'] = self.session.csp.n_bt
+            searched['trace'] = self.session.trace
+            return solution
+
+        solution = solution_cache.solve(self.current_board, search)
+
+        if solution:
+            self.__set_board(solution)
         else:
             messagebox.showerror("Error", "Invalid sudoku puzzle, please check the initial state")
 
         self.__draw_puzzle()
-        self.time.set("Time: " + str(round(end - start, 5)) + " seconds")
-        self.n_bt.set("N. BR: " + str(s.n_bt))
+        self.time.set("Time: " + str(round(searched['time'], 5)) + " seconds")
+        self.n_bt.set("N. BR: " + str(searched['n_bt']))
+        self.logic.set("Logic: " + format_trace(searched['trace']))
 
         for rb in self.radio:
             rb.config(state=NORMAL)
@@ -137,12 +193,25 @@ class SudokuUI(Frame):
         level_menu.add_radiobutton(label="Easy", variable=self.level, value=1, command=self.__change_level)
         level_menu.add_radiobutton(label="Hard", variable=self.level, value=2, command=self.__change_level)
 
-    def __change_level(self):
+    def __new_board(self):
+        if self.bank is not None:
+            low, high = LEVELS[self.level.get()]
+            index = self.bank.sample(low=low, high=high)
+            if index is not None:
+                return self.bank.board(index)
         sudoku_board = SudokoGenarator.generate_sudoku()
         num_to_remove = 40  # Adjust the number of removed elements as needed
         SudokoGenarator.remove_numbers(sudoku_board, num_to_remove)
-        self.original_board = copy.deepcopy(sudoku_board)
-        self.current_board = copy.deepcopy(self.original_board)
+        return sudoku_board
+
+    def __set_board(self, board):
+        self.model.load(board)
+        self.current_board = self.model.cells
+
+    def __change_level(self):
+        self.original_board = self.__new_board()
+        self.__set_board(self.original_board)
+        self.session = SolveSession(self.original_board)
         self.__draw_puzzle()
 
     def __draw_grid(self):
@@ -163,26 +232,38 @@ class SudokuUI(Frame):
             self.canvas.create_line(x0, y0, x1, y1, fill=color)
 
     def __draw_puzzle(self):
-        self.canvas.delete("numbers")
         self.time.set("Time:                  ")
         self.n_bt.set("N. BT:   ")
-        for i in range(size):
-            for j in range(size):
-                cell = self.current_board[i][j]
-                if cell != 0:
-                    x = MARGIN + j * SIDE + SIDE / 2
-                    y = MARGIN + i * SIDE + SIDE / 2
-                    if str(cell) == str(self.original_board[i][j]):
-                        self.canvas.create_text(x, y, text=cell, tags="numbers", fill="black")
-                    else:
-                        self.canvas.create_text(x, y, text=cell, tags="numbers", fill="red")
+        self.logic.set("Logic:   ")
+        self.__draw_cells()
+
+    def __draw_cells(self, cells=None):
+        """Redraw the number or the pencil marks of cells (all the cells if None)."""
+        if cells is None:
+            self.canvas.delete("numbers", "pencil")
+            cells = [(i, j) for i in range(size) for j in range(size)]
+        for i, j in cells:
+            tag = "cell{}_{}".format(i, j)
+            self.canvas.delete(tag)
+            cell = self.current_board[i][j]
+            if cell != 0:
+                x = MARGIN + j * SIDE + SIDE / 2
+                y = MARGIN + i * SIDE + SIDE / 2
+                if str(cell) == str(self.original_board[i][j]):
+                    self.canvas.create_text(x, y, text=cell, tags=("numbers", tag), fill="black")
+                else:
+                    self.canvas.create_text(x, y, text=cell, tags=("numbers", tag), fill="red")
+            elif self.pencil.get():
+                # digit d in the small grid of the cell, 1 top left and 9 bottom right
+                for d in self.model.candidates(i, j):
+                    x = MARGIN + j * SIDE + ((d - 1) % 3 + 0.5) * SIDE / 3
+                    y = MARGIN + i * SIDE + ((d - 1) // 3 + 0.5) * SIDE / 3
+                    self.canvas.create_text(x, y, text=d, tags=("pencil", tag), fill="gray", font=("", 7))
 
     def __clear_board(self):
-        sudoku_board = SudokoGenarator.generate_sudoku()
-        num_to_remove = 40  # Adjust the number of removed elements as needed
-        SudokoGenarator.remove_numbers(sudoku_board, num_to_remove)
-        self.original_board = copy.deepcopy(sudoku_board)
-        self.current_board = copy.deepcopy(self.original_board)
+        self.original_board = self.__new_board()
+        self.__set_board(self.original_board)
+        self.session = SolveSession(self.original_board)
         self.__draw_puzzle()
 
     def on_cell_click(self, event):
@@ -198,19 +279,54 @@ class SudokuUI(Frame):
 
             if user_input is not None:
                 if self.is_valid_input(user_input, row, col):
-                    self.current_board[row][col] = user_input
-                    self.__draw_puzzle()
+                    # only the cell and its peers change
+                    self.__draw_cells(self.model.set(row, col, user_input))
+                    self.session.set(row, col, user_input)
+                    self.check_solvable()
                 else:
                     messagebox.showerror("Invalid Input", "Invalid input in cell ({}, {}). Please try again.".format(row, col))
 
+    # the session answers at once while its last solution fits, otherwise the search runs in a thread
+    # and the main loop looks at it every CHECK_POLL ms, so the window never waits for it
+    def check_solvable(self):
+        known = self.session.check()
+        if known is not None:
+            if not known:
+                messagebox.showwarning("No solution", "The board has no solution anymore.")
+            return
+        if self.checking is not None:
+            # the running check sees that the board changed and starts again when it ends
+            return
+        session, version = self.session, self.session.version
+        search = session.search()
+        result = {}
+
+        def run():
+            # an error is handed to the main loop, a Tk callback must not find the result missing
+            try:
+                result['value'] = search()
+            except Exception as e:
+                result['error'] = e
+
+        self.checking = threading.Thread(target=run, daemon=True)
+        self.checking.start()
+        self.parent.after(CHECK_POLL, self.__poll_check, session, version, result)
+
+    def __poll_check(self, session, version, result):
+        if self.checking.is_alive():
+            self.parent.after(CHECK_POLL, self.__poll_check, session, version, result)
+            return
+        self.checking = None
+        if session is not self.session:
+            return
+        if version != session.version:
+            self.check_solvable()
+        elif 'error' in result:
+            # the board is neither known to be solvable nor not: it is checked again after the next edit
+            messagebox.showerror("Error", "The solvability check failed: {}".format(result['error']))
+        elif session.finish(version, result['value']) is None:
+            messagebox.showwarning("No solution", "The board has no solution anymore.")
+
+    # the row, column and square masks of the model answer without scanning the board
     def is_valid_input(self, num, row, col):
-        if num in self.current_board[row] or num in [self.current_board[i][col] for i in range(size)]:
-            return False
-
-        start_row, start_col = 3 * (row // 3), 3 * (col // 3)
-        for i in range(3):
-            for j in range(3):
-                if self.current_board[start_row + i][start_col + j] == num:
-                    return False
-
-        return True
\ No newline at end of file
+        return self.model.is_valid(num, row, col)
@@ -0,0 +1,281 @@
+"""Offline import of boards from screenshots like the ones in levels/.
+
+The grid is found from the long dark lines of the image and every cell is compared
+against digit templates with NumPy (no OCR library, no network). Templates are learned
+from a screenshot whose board is known, by default levels/Easy0.png which shows the
+first easy board of Test.py. Boards are cached by the sha1 of the image file, so a
+directory of screenshots is only recognized once:
+
+    python imageimport.py levels/ [cache directory] > levels.txt
+
+The PNG decoder is NumPy only. The rows with the filters none, sub and up are decoded a
+row at a time; the average and Paeth filters depend on the byte just decoded, so their
+rows go byte by byte in Python and a large image saved with them takes a second or more.
+"""
+
+import dbm
+import hashlib
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from puzzleio import Puzzle, board_from_string, board_to_string, write_lines
+
+CELL_SIZE = 40
+SHIFT = 3
+LEVELS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'levels')
+
+
+# ______________________________________________________________________________
+# PNG decoding (8 bits gray, gray+alpha, RGB or RGBA, not interlaced)
+
+
+_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def _unfilter(kind, line, previous, bpp):
+    """The bytes of a row with the average (3) or Paeth (4) filter, with plain ints: each byte
+    depends on the one bpp before it, so the row cannot be decoded at once."""
+    row = line.tolist()
+    up = previous.tolist()
+    for x in range(len(row)):
+        left = row[x - bpp] if x >= bpp else 0
+        if kind == 3:
+            row[x] = (row[x] + ((left + up[x]) >> 1)) & 255
+        else:
+            upper_left = up[x - bpp] if x >= bpp else 0
+            row[x] = (row[x] + _paeth(left, up[x], upper_left)) & 255
+    return np.array(row, dtype=np.uint8)
+
+
+def read_png(path):
+    """Return the image of path as a 2D uint8 array of gray levels."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError('{} is not a PNG file'.format(path))
+    pos, idat = 8, []
+    depth = color = interlace = None
+    while pos < len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        if kind == b'IHDR':
+            width, height, depth, color, _, _, interlace = struct.unpack('>IIBBBBB', chunk)
+        elif kind == b'IDAT':
+            idat.append(chunk)
+        pos += 12 + length
+    if depth is None:
+        raise ValueError('{}: not a PNG: no IHDR chunk'.format(path))
+    if depth != 8 or color not in _CHANNELS or interlace:
+        raise ValueError('{}: only 8 bits, not interlaced, non palette PNG files are supported'.format(path))
+
+    bpp = _CHANNELS[color]
+    stride = width * bpp
+    raw = np.frombuffer(zlib.decompress(b''.join(idat)), dtype=np.uint8).reshape(height, stride + 1)
+    pixels = np.zeros((height, stride), dtype=np.uint8)
+    previous = np.zeros(stride, dtype=np.uint8)
+    for y in range(height):
+        kind, line = raw[y, 0], raw[y, 1:]
+        if kind == 0:
+            row = line.copy()
+        elif kind == 1:
+            # every channel is a running sum of its bytes
+            row = (np.cumsum(line.reshape(-1, bpp), axis=0, dtype=np.uint32) & 255).astype(np.uint8).ravel()
+        elif kind == 2:
+            row = line + previous
+        elif kind in (3, 4):
+            row = _unfilter(kind, line, previous, bpp)
+        else:
+            raise ValueError('{}: bad PNG filter type {}'.format(path, kind))
+        pixels[y] = previous = row
+
+    pixels = pixels.reshape(height, width, bpp).astype(np.float32)
+    if bpp in (1, 2):
+        gray = pixels[:, :, 0]
+    else:
+        gray = pixels[:, :, :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    if bpp in (2, 4):
+        # transparent pixels are shown as white
+        alpha = pixels[:, :, -1] / 255
+        gray = gray * alpha + 255 * (1 - alpha)
+    return gray.astype(np.uint8)
+
+
+# ______________________________________________________________________________
+# Grid and cells
+
+
+def _line_centers(profile, length):
+    """Centers of the runs of consecutive positions whose profile (dark pixels) is at least length."""
+    positions = np.flatnonzero(profile >= length)
+    centers, start = [], None
+    for k, p in enumerate(positions):
+        if start is None:
+            start = p
+        if k + 1 == len(positions) or positions[k + 1] != p + 1:
+            centers.append((start + p) / 2)
+            start = None
+    return centers
+
+
+def _grid_lines(centers):
+    """Return the 10 equally spaced centers spanning the largest distance, or None."""
+    best = None
+    for i, first in enumerate(centers):
+        for last in centers[i + 1:]:
+            step = (last - first) / 9
+            if step < 8 or (best is not None and last - first <= best[-1] - best[0]):
+                continue
+            lines = []
+            for k in range(10):
+                expected = first + k * step
+                near = min(centers, key=lambda c: abs(c - expected))
+                if abs(near - expected) > max(2, step / 10):
+                    break
+                lines.append(near)
+            else:
+                best = lines
+    return best
+
+
+def find_grid(gray):
+    """Return (row lines, column lines), the 10 y and x coordinates of the grid lines."""
+    dark = gray < 220
+    rows = _grid_lines(_line_centers(dark.sum(axis=1), gray.shape[1] // 3))
+    columns = _grid_lines(_line_centers(dark.sum(axis=0), gray.shape[0] // 3))
+    if rows is None or columns is None:
+        raise ValueError('no 9x9 grid found')
+    return rows, columns
+
+
+def _resample(cell):
+    """Scale a cell to CELL_SIZE x CELL_SIZE: area average when shrinking, nearest pixel when growing."""
+    ys = np.minimum(np.arange(cell.shape[0]) * CELL_SIZE // cell.shape[0], CELL_SIZE - 1)
+    xs = np.minimum(np.arange(cell.shape[1]) * CELL_SIZE // cell.shape[1], CELL_SIZE - 1)
+    if cell.shape[0] >= CELL_SIZE and cell.shape[1] >= CELL_SIZE:
+        sums = np.zeros((CELL_SIZE, CELL_SIZE), dtype=np.float32)
+        counts = np.zeros((CELL_SIZE, CELL_SIZE), dtype=np.float32)
+        np.add.at(sums, (ys[:, None], xs[None, :]), cell)
+        np.add.at(counts, (ys[:, None], xs[None, :]), 1)
+        return sums / counts
+    yi = (np.arange(CELL_SIZE) * cell.shape[0] / CELL_SIZE).astype(int)
+    xi = (np.arange(CELL_SIZE) * cell.shape[1] / CELL_SIZE).astype(int)
+    return cell[np.ix_(yi, xi)].astype(np.float32)
+
+
+def _normalize(ink):
+    ink = ink - ink.mean()
+    norm = np.linalg.norm(ink)
+    return ink / norm if norm else ink
+
+
+def cells(gray):
+    """Return the 81 cells of the board in gray as CELL_SIZE x CELL_SIZE arrays of ink
+    (0 is white), None for the empty cells, row by row."""
+    rows, columns = find_grid(gray)
+    inks = []
+    for i in range(9):
+        for j in range(9):
+            top, bottom = rows[i], rows[i + 1]
+            left, right = columns[j], columns[j + 1]
+            # skip the grid lines around the cell
+            dy, dx = (bottom - top) * 0.12, (right - left) * 0.12
+            cell = gray[int(top + dy):int(bottom - dy), int(left + dx):int(right - dx)]
+            inks.append(255 - _resample(cell) if (cell < 128).sum() >= 4 else None)
+    return inks
+
+
+# ______________________________________________________________________________
+# Templates and recognition
+
+
+def learn_templates(gray, board):
+    """Return a (9, CELL_SIZE, CELL_SIZE) array, the mean ink of every digit of the known
+    board shown in gray. Digits that do not appear are left at zero."""
+    sums = np.zeros((9, CELL_SIZE, CELL_SIZE), dtype=np.float32)
+    counts = np.zeros(9)
+    for ink, value in zip(cells(gray), (v for row in board for v in row)):
+        if ink is not None and value:
+            sums[value - 1] += ink
+            counts[value - 1] += 1
+    counts[counts == 0] = 1
+    return sums / counts[:, None, None]
+
+
+def default_templates():
+    """Templates learned from levels/Easy0.png, the first easy board of Test.py."""
+    from Test import Test
+    test = Test()
+    test.set_board(1, 0)
+    return learn_templates(read_png(os.path.join(LEVELS, 'Easy0.png')), test.original_board)
+
+
+def recognize(gray, templates):
+    """Return the board shown in gray. Every cell is shifted by up to SHIFT pixels in each
+    direction and gets the digit whose template has the best normalized correlation."""
+    inks = cells(gray)
+    found = [k for k, ink in enumerate(inks) if ink is not None]
+    values = [0] * 81
+    if found:
+        flat = np.stack([_normalize(t) for t in templates]).reshape(9, -1)
+        padded = np.pad(np.stack([inks[k] for k in found]), ((0, 0), (SHIFT, SHIFT), (SHIFT, SHIFT)))
+        best = np.full((len(found), 9), -np.inf, dtype=np.float32)
+        for dy in range(2 * SHIFT + 1):
+            for dx in range(2 * SHIFT + 1):
+                window = padded[:, dy:dy + CELL_SIZE, dx:dx + CELL_SIZE].reshape(len(found), -1)
+                window = window - window.mean(axis=1, keepdims=True)
+                window /= np.maximum(np.linalg.norm(window, axis=1, keepdims=True), 1e-6)
+                np.maximum(best, window @ flat.T, out=best)
+        for k, digit in zip(found, best.argmax(axis=1) + 1):
+            values[k] = int(digit)
+    return [values[i:i + 9] for i in range(0, 81, 9)]
+
+
+class BoardImporter:
+    """Recognize screenshots, caching the boards by image hash in a dbm file when cache_path is given."""
+
+    def __init__(self, templates=None, cache_path=None):
+        self.templates = templates
+        self.cache = dbm.open(cache_path, 'c') if cache_path else None
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            key = hashlib.sha1(f.read()).hexdigest()
+        if self.cache is not None and key in self.cache:
+            return board_from_string(self.cache[key].decode())
+        if self.templates is None:
+            self.templates = default_templates()
+        board = recognize(read_png(path), self.templates)
+        if self.cache is not None:
+            self.cache[key] = board_to_string(board)
+        return board
+
+    def read_directory(self, directory):
+        """Yield a Puzzle for every PNG file of directory, with the file name in meta['source']."""
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith('.png'):
+                yield Puzzle(self.read(os.path.join(directory, name)), meta={'source': name})
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+
+if __name__ == '__main__':
+    importer = BoardImporter(cache_path=os.path.join(sys.argv[2] if len(sys.argv) > 2 else '.', '.imageimport'))
+    try:
+        write_lines(importer.read_directory(sys.argv[1]), sys.stdout)
+    finally:
+        importer.close()
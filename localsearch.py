@@ -0,0 +1,150 @@
+"""Min-conflicts local search for SudokuCSP boards of any size, classic or Jigsaw.
+
+The givens never move, nor do the cells that arc consistency (AC3, run first) leaves
+with one value. Every square is filled with a random permutation of its missing digits,
+so the square constraints always hold, and a move swaps two free cells of the same
+square (or region). Only the rows and the columns can then be in conflict: the cost of
+a board is the number of repeated digits in its rows and columns, kept with one count
+per (row, digit) and (column, digit), so the cost change of a swap is read from 8
+counts and the rows and columns in conflict are known without scanning the board.
+
+Each step takes a row or column with a repeated digit, one of the free cells holding
+that digit, and makes the best swap of that cell inside its square. A swap that puts
+back a value moved in the last tabu_tenure steps is not allowed unless it reaches a
+new best cost, and after plateau_limit steps without a new best the board is
+filled again at random. The search stops after max_steps swaps.
+
+Local search cannot tell that a board has no solution: min_conflicts then returns None
+once its steps are spent. It pays off on big boards (16x16, 25x25) with few givens,
+where the backtracking search is slow to recover from a wrong early choice.
+"""
+
+import random
+
+from csp import AC3
+
+
+def min_conflicts(csp, max_steps=100000, tabu_tenure=2, plateau_limit=2000, rng=None):
+    """Return a solution of the SudokuCSP csp as an assignment {var: value}, or None when
+    max_steps swaps were not enough. rng is a random.Random (or a seed) for reproducible runs.
+    csp.nassigns counts the cells changed."""
+    if not isinstance(rng, random.Random):
+        rng = random.Random(rng)
+    n = csp.size
+    if len(csp.units) != 3 * n or csp.nary:
+        raise ValueError('min_conflicts only knows the rows, columns and squares (or Jigsaw regions)')
+    digits = csp.digits()
+    # arc consistency first: the cells it leaves with one value are fixed like the givens
+    if not AC3(csp):
+        return None
+    domains = csp.curr_domains
+    # the cells are the indexes 0 .. n*n-1 of csp.variables and the values are ints 1 .. n
+    given = [len(domains[var]) == 1 for var in csp.variables]
+    grid = [int(domains[var][0]) if fixed else 0 for var, fixed in zip(csp.variables, given)]
+    index = {var: k for k, var in enumerate(csp.variables)}
+    squares = [[index[var] for var in unit] for unit in csp.units[2 * n:]]
+    square_of = [0] * (n * n)
+    free = []
+    for s, cells in enumerate(squares):
+        for k in cells:
+            square_of[k] = s
+        free.append([k for k in cells if not given[k]])
+        if len({grid[k] for k in cells if given[k]}) != n - len(free[s]):
+            return None  # the givens repeat a digit in this square
+
+    def fill():
+        for s, cells in enumerate(free):
+            missing = list(set(range(1, n + 1)) - {grid[k] for k in squares[s] if given[k]})
+            rng.shuffle(missing)
+            for k, value in zip(cells, missing):
+                grid[k] = value
+        rows = [[0] * (n + 1) for _ in range(n)]
+        cols = [[0] * (n + 1) for _ in range(n)]
+        for k, value in enumerate(grid):
+            rows[k // n][value] += 1
+            cols[k % n][value] += 1
+        return rows, cols, [repeats(counts) for counts in rows], [repeats(counts) for counts in cols]
+
+    def repeats(counts):
+        return sum(c - 1 for c in counts if c > 1)
+
+    def delta(a, b):
+        """Cost change of swapping the cells a and b (same square, different values)."""
+        va, vb = grid[a], grid[b]
+        d = 0
+        ra, rb = a // n, b // n
+        if ra != rb:
+            row_a, row_b = rows[ra], rows[rb]
+            d += (row_a[vb] > 0) - (row_a[va] > 1) + (row_b[va] > 0) - (row_b[vb] > 1)
+        ca, cb = a % n, b % n
+        if ca != cb:
+            col_a, col_b = cols[ca], cols[cb]
+            d += (col_a[vb] > 0) - (col_a[va] > 1) + (col_b[va] > 0) - (col_b[vb] > 1)
+        return d
+
+    def move(k, old, new):
+        i, j = k // n, k % n
+        row, col = rows[i], cols[j]
+        row_repeats[i] += (row[new] > 0) - (row[old] > 1)
+        col_repeats[j] += (col[new] > 0) - (col[old] > 1)
+        row[old] -= 1
+        col[old] -= 1
+        row[new] += 1
+        col[new] += 1
+        grid[k] = new
+
+    rows, cols, row_repeats, col_repeats = fill()
+    cost = sum(row_repeats) + sum(col_repeats)
+    best = cost
+    last_best = 0
+    # (cell, value) -> step until which value may not be put back in cell
+    tabu = {}
+    for step in range(max_steps):
+        if cost == 0:
+            return {var: digits[value - 1] for var, value in zip(csp.variables, grid)}
+        if step - last_best > plateau_limit:
+            rows, cols, row_repeats, col_repeats = fill()
+            cost = sum(row_repeats) + sum(col_repeats)
+            best, last_best = cost, step
+            tabu.clear()
+            continue
+
+        # a free cell holding a repeated digit of a row or a column
+        conflicted = [('row', i) for i in range(n) if row_repeats[i]]
+        conflicted += [('col', j) for j in range(n) if col_repeats[j]]
+        kind, i = rng.choice(conflicted)
+        if kind == 'row':
+            cells = range(i * n, i * n + n)
+            counts = rows[i]
+        else:
+            cells = range(i, n * n, n)
+            counts = cols[i]
+        candidates = [k for k in cells if not given[k] and counts[grid[k]] > 1]
+        if not candidates:
+            continue
+        a = rng.choice(candidates)
+
+        best_moves, best_delta = [], None
+        for b in free[square_of[a]]:
+            if b == a or grid[b] == grid[a]:
+                continue
+            d = delta(a, b)
+            if (tabu.get((a, grid[b]), -1) >= step or tabu.get((b, grid[a]), -1) >= step) and cost + d >= best:
+                continue
+            if best_delta is None or d < best_delta:
+                best_moves, best_delta = [b], d
+            elif d == best_delta:
+                best_moves.append(b)
+        if not best_moves:
+            continue
+        b = rng.choice(best_moves)
+        va, vb = grid[a], grid[b]
+        move(a, va, vb)
+        move(b, vb, va)
+        tabu[(a, va)] = tabu[(b, vb)] = step + tabu_tenure
+        csp.nassigns += 2
+        cost += best_delta
+        if cost < best:
+            best, last_best = cost, step
+    return ({var: digits[value - 1] for var, value in zip(csp.variables, grid)}
+            if cost == 0 else None)
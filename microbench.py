@@ -0,0 +1,163 @@
+"""Microbenchmarks of the building blocks of the search.
+
+    python microbench.py                          run all and print the ops/s
+    python microbench.py --save baseline.json     ... and store them
+    python microbench.py --compare baseline.json  ... and compare with stored ones
+    python microbench.py mrv revise               only these
+
+Every benchmark runs on the same state: a hard board (Test.py level 2, board 0) where
+STEPS cells, picked with a seeded random.Random, are assigned their solution value with
+forward checking, so the domains look like the middle of a search. The operations that
+change the state undo it in the same run (prune then restore, suppose then restore, ...)
+and are measured together.
+
+A run is timed repeat times after a calibration (timeit.Timer.autorange); the median is
+reported as operations per second, with the spread (max - min) / median of the repeats.
+With --compare an operation slower than the baseline by more than --threshold is a
+regression and the exit status is 1, so an end-to-end slowdown seen with Test.py or
+'cli bench' can be traced to the primitive that caused it. The numbers depend on the
+machine: compare with a baseline saved on the same one.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import timeit
+
+from csp import backtracking_search, revise, mrv, unordered_domain_values, forward_checking
+from sudokucsp import SudokuCSP
+from Test import Test
+
+# cells assigned in the benchmark state, and the seed that picks them
+STEPS = 20
+SEED = 1
+
+
+def make_state(level=2, which=0, steps=STEPS, seed=SEED):
+    """Return (board, csp, assignment): the csp has its curr_domains after the steps assignments
+    with forward checking, as in the middle of a search."""
+    t = Test()
+    t.set_board(level, which)
+    board = t.original_board
+    solution = backtracking_search(SudokuCSP(board), mrv, unordered_domain_values, forward_checking)
+    csp = SudokuCSP(board)
+    csp.support_pruning()
+    assignment = {}
+    empty = [var for var in csp.variables if len(csp.domains[var]) > 1]
+    for var in random.Random(seed).sample(empty, steps):
+        csp.suppose(var, solution[var])
+        forward_checking(csp, var, solution[var], assignment, None)
+        assignment[var] = solution[var]
+    return board, csp, assignment
+
+
+def make_benchmarks(board, csp, assignment):
+    """Return {name: (run, ops)}: run() makes ops operations and leaves csp as it found it."""
+    free = [var for var in csp.variables if var not in assignment]
+    arcs = [(x, y) for x in free for y in csp.neighbors[x] if y not in assignment]
+    # a value of every free cell, the first one left: what the search would try
+    tries = [(var, csp.curr_domains[var][0]) for var in free]
+    # the values ruled out of the free cells, to be checked against the assignment
+    ruled_out = [(var, value) for var in free for value in csp.digits() if value not in csp.curr_domains[var]]
+
+    def run_nconflicts():
+        for var, value in ruled_out:
+            csp.nconflicts(var, value, assignment)
+
+    def run_revise():
+        removals = []
+        for x, y in arcs:
+            revise(csp, x, y, removals)
+        csp.restore(removals)
+
+    def run_prune_restore():
+        removals = []
+        for var, value in tries:
+            csp.prune(var, value, removals)
+        csp.restore(removals)
+
+    def run_suppose_restore():
+        for var, value in tries:
+            csp.restore(csp.suppose(var, value))
+
+    def run_forward_checking():
+        for var, value in tries:
+            removals = csp.suppose(var, value)
+            forward_checking(csp, var, value, assignment, removals)
+            csp.restore(removals)
+
+    def run_mrv():
+        mrv(assignment, csp)
+
+    def run_init():
+        SudokuCSP(board)
+
+    return {'nconflicts': (run_nconflicts, len(ruled_out)),
+            'revise': (run_revise, len(arcs)),
+            'prune_restore': (run_prune_restore, len(tries)),
+            'suppose_restore': (run_suppose_restore, len(tries)),
+            'forward_checking': (run_forward_checking, len(tries)),
+            'mrv': (run_mrv, 1),
+            'init': (run_init, 1)}
+
+
+def measure(run, ops, repeat=7):
+    """Return (median ops/s, spread) of repeat timings of as many runs as autorange picks."""
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    rates = [number * ops / seconds for seconds in timer.repeat(repeat, number)]
+    median = statistics.median(rates)
+    return median, (max(rates) - min(rates)) / median
+
+
+def compare(results, baseline, threshold):
+    """Print the change of every result from the baseline; return the names of the regressions."""
+    regressions = []
+    for name, (rate, _) in results.items():
+        if name not in baseline:
+            print('{:<18} no baseline'.format(name))
+            continue
+        change = rate / baseline[name] - 1
+        slower = change < -threshold
+        if slower:
+            regressions.append(name)
+        print('{:<18} {:>+7.1%}{}'.format(name, change, '  REGRESSION' if slower else ''))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Microbenchmarks of the csp primitives.')
+    parser.add_argument('names', nargs='*', help='benchmarks to run (default all)')
+    parser.add_argument('--repeat', type=int, default=7, help='timings per benchmark (default 7)')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='compare with the results of this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown that is a regression with --compare (default 0.1 = 10%%)')
+    args = parser.parse_args(argv)
+
+    benchmarks = make_benchmarks(*make_state())
+    unknown = [name for name in args.names if name not in benchmarks]
+    if unknown:
+        parser.error('unknown benchmarks: {} (choose from {})'.format(', '.join(unknown), ', '.join(benchmarks)))
+    results = {}
+    for name in args.names or benchmarks:
+        run, ops = benchmarks[name]
+        results[name] = measure(run, ops, args.repeat)
+        print('{:<18} {:>14,.0f} ops/s  +-{:.1%}'.format(name, *results[name]))
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print('\ncompared with ' + args.compare)
+        if compare(results, baseline, args.threshold):
+            status = 1
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({name: rate for name, (rate, _) in results.items()}, f, indent=1)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""Human-style logic applied before the search.
+
+presolve(csp) removes candidates from csp.curr_domains with the techniques of LADDER,
+always going back to the easiest one after a technique fires, until none fires. Most
+published puzzles are solved by the singles alone; the others reach the search with
+reduced domains, which backtracking_search and the inferences use as they are. The
+candidates are removed with csp.prune, so the support counts of SudokuCSP stay right.
+
+The techniques work on csp.units (rows, columns, squares or Jigsaw regions, diagonals),
+the fish on the rows and columns. A cell is placed when it has one candidate left: its
+digit is removed from all its neighbors, which covers the Killer cages too (their sums
+are left to the search).
+
+The trace is a list of (technique, times it fired), in the order of the ladder, e.g.
+[('naked single', 41), ('hidden single', 9), ('locked candidates', 2)]. A single fires
+once per cell it places, the other techniques once per pattern that removed candidates.
+"""
+
+import itertools
+
+
+def _place(csp, var, placed):
+    """Remove the digit of var (one candidate left) from its neighbors."""
+    placed.add(var)
+    value = csp.curr_domains[var][0]
+    for other in csp.neighbors[var]:
+        if value in csp.curr_domains[other]:
+            csp.prune(other, value, None)
+
+
+def naked_singles(csp, placed):
+    """A cell with one candidate holds it."""
+    fired = 0
+    for var in csp.variables:
+        if var not in placed and len(csp.curr_domains[var]) == 1:
+            _place(csp, var, placed)
+            # the givens are placed, but they are not a technique
+            if len(csp.domains[var]) > 1:
+                fired += 1
+    return fired
+
+
+def hidden_singles(csp, placed):
+    """A digit with one possible cell in a unit goes there."""
+    fired = 0
+    for unit in csp.units:
+        for value in csp.digits():
+            cells = [var for var in unit if value in csp.curr_domains[var]]
+            if len(cells) == 1 and len(csp.curr_domains[cells[0]]) > 1:
+                var = cells[0]
+                for other in [v for v in csp.curr_domains[var] if v != value]:
+                    csp.prune(var, other, None)
+                _place(csp, var, placed)
+                fired += 1
+    return fired
+
+
+def _intersections(csp):
+    """The pairs of units sharing two cells or more, with the shared cells."""
+    pairs = []
+    for a, b in itertools.permutations(csp.units, 2):
+        common = set(a) & set(b)
+        if len(common) > 1:
+            pairs.append((a, b, common))
+    return pairs
+
+
+def locked_candidates(csp, placed):
+    """When the candidates of a digit in a unit all lie in a second unit, the digit is in the
+    shared cells and leaves the rest of the second unit (pointing and claiming)."""
+    fired = 0
+    for a, b, common in _intersections(csp):
+        for value in csp.digits():
+            cells = [var for var in a if value in csp.curr_domains[var]]
+            if len(cells) > 1 and all(var in common for var in cells):
+                removed = [var for var in b if var not in common and value in csp.curr_domains[var]]
+                for var in removed:
+                    csp.prune(var, value, None)
+                fired += bool(removed)
+    return fired
+
+
+def naked_subsets(csp, placed, sizes=(2, 3, 4)):
+    """k cells of a unit with k candidates in all leave these candidates to themselves."""
+    fired = 0
+    for unit in csp.units:
+        open_cells = [var for var in unit if len(csp.curr_domains[var]) > 1]
+        for k in sizes:
+            small = [var for var in open_cells if len(csp.curr_domains[var]) <= k]
+            for cells in itertools.combinations(small, k):
+                values = set().union(*(csp.curr_domains[var] for var in cells))
+                if len(values) != k:
+                    continue
+                removed = False
+                for var in open_cells:
+                    if var not in cells:
+                        for value in [v for v in csp.curr_domains[var] if v in values]:
+                            csp.prune(var, value, None)
+                            removed = True
+                fired += removed
+    return fired
+
+
+def hidden_subsets(csp, placed, sizes=(2, 3, 4)):
+    """k digits with all their candidates in the same k cells of a unit fill these cells."""
+    fired = 0
+    for unit in csp.units:
+        where = {}
+        for value in csp.digits():
+            cells = frozenset(var for var in unit if value in csp.curr_domains[var])
+            if len(cells) > 1:
+                where[value] = cells
+        for k in sizes:
+            for values in itertools.combinations([v for v in where if len(where[v]) <= k], k):
+                cells = frozenset().union(*(where[v] for v in values))
+                if len(cells) != k:
+                    continue
+                removed = False
+                for var in cells:
+                    for value in [v for v in csp.curr_domains[var] if v not in values]:
+                        csp.prune(var, value, None)
+                        removed = True
+                fired += removed
+    return fired
+
+
+def _fish(csp, k):
+    """k rows where a digit can only be in the same k columns: the digit leaves the rest of
+    these columns (and the same with the rows and columns swapped)."""
+    n = csp.size
+    rows, columns = csp.units[:n], csp.units[n:2 * n]
+    fired = 0
+    for bases, covers in ((rows, columns), (columns, rows)):
+        for value in csp.digits():
+            # for every base line, the positions of the digit along the line
+            lines = {}
+            for i, line in enumerate(bases):
+                positions = frozenset(j for j, var in enumerate(line) if value in csp.curr_domains[var])
+                if 1 < len(positions) <= k:
+                    lines[i] = positions
+            for chosen in itertools.combinations(lines, k):
+                positions = frozenset().union(*(lines[i] for i in chosen))
+                if len(positions) != k:
+                    continue
+                removed = False
+                for j in positions:
+                    for i, var in enumerate(covers[j]):
+                        if i not in chosen and value in csp.curr_domains[var]:
+                            csp.prune(var, value, None)
+                            removed = True
+                fired += removed
+    return fired
+
+
+def x_wing(csp, placed):
+    return _fish(csp, 2)
+
+
+def swordfish(csp, placed):
+    return _fish(csp, 3)
+
+
+# from the easiest to the hardest
+LADDER = (('naked single', naked_singles), ('hidden single', hidden_singles),
+          ('locked candidates', locked_candidates), ('naked subset', naked_subsets),
+          ('hidden subset', hidden_subsets), ('x-wing', x_wing), ('swordfish', swordfish))
+
+
+def presolve(csp, ladder=LADDER):
+    """Reduce csp.curr_domains with the techniques of ladder until none fires and return the
+    trace. The board is solved when every domain has one value, and has no solution when a
+    domain is empty."""
+    csp.support_pruning()
+    counts = dict.fromkeys((name for name, _ in ladder), 0)
+    placed = set()
+    fired = True
+    while fired:
+        fired = False
+        for name, technique in ladder:
+            times = technique(csp, placed)
+            if times:
+                counts[name] += times
+                fired = True
+                break
+        if any(not csp.curr_domains[var] for var in csp.variables):
+            break
+    return [(name, times) for name, times in counts.items() if times]
+
+
+def is_solved(csp):
+    """Return true if presolve left one value in every domain."""
+    return all(len(csp.curr_domains[var]) == 1 for var in csp.variables)
+
+
+def format_trace(trace):
+    """Return the trace as text, e.g. 'naked single x41, hidden single x9'."""
+    return ', '.join('{} x{}'.format(name, times) for name, times in trace) or 'none'
@@ -0,0 +1,118 @@
+"""Puzzle production: many new, unique, rated and distinct puzzles, reproducible from a seed.
+
+Every puzzle goes through the same stages, all in one worker call:
+    grid        a random full board (SudokoGenarator.generate_sudoku)
+    removal     clues are removed in a random order while the puzzle keeps one solution,
+                until remove cells are empty or no clue can go
+    rating      clues, difficulty (backtracks of MRV + FC) and the trace of presolver.py
+    key         the canonical form of solutioncache.py, equal for the puzzles that only
+                differ by a relabeling, a rotation or row/column swaps
+and the parent drops the puzzles whose key was already produced (dedup).
+
+Puzzle index i of a run only depends on (seed, i): its random numbers come from a
+random.Random seeded with derive_seed(seed, i), so the puzzles are the same whatever the
+number of worker processes, and any of them can be made again alone (make_puzzle).
+
+    python -m cli produce --count 100000 --seed 7 --jobs 8 --output night.csv
+"""
+
+import hashlib
+import random
+
+import SudokoGenarator
+from csp import backtracking_search, mrv, unordered_domain_values, forward_checking
+from presolver import presolve, format_trace
+from puzzleio import Puzzle
+from solutioncache import canonical_form
+from solver import rate_board
+from sudokucsp import SudokuCSP
+
+
+def derive_seed(seed, index):
+    """Return the seed of the puzzle index of the run seed (a 64 bits int)."""
+    digest = hashlib.blake2b('{}:{}'.format(seed, index).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def is_unique_without(board, row, col, value):
+    """Return true if the cell (row, col), just emptied, can only take value again, that is if the
+    puzzle (which had one solution with the cell given) still has one: a search for a solution
+    with another digit there must fail."""
+    s = SudokuCSP(board)
+    var = s.variables[row * s.size + col]
+    s.domains[var] = tuple(d for d in s.domains[var] if d != str(value))
+    return backtracking_search(s, mrv, unordered_domain_values, forward_checking) is None
+
+
+def remove_clues(board, remove, rng):
+    """Empty up to remove cells of the full board, in a random order, keeping one solution."""
+    positions = [(i, j) for i in range(9) for j in range(9)]
+    rng.shuffle(positions)
+    removed = 0
+    for row, col in positions:
+        if removed >= remove:
+            break
+        value = board[row][col]
+        board[row][col] = 0
+        if is_unique_without(board, row, col, value):
+            removed += 1
+        else:
+            board[row][col] = value
+    return board
+
+
+def make_puzzle(seed, index, remove=55):
+    """Return the Puzzle index of the run seed with its solution and meta: seed, index, clues,
+    difficulty, techniques (the presolver trace) and key (canonical form)."""
+    rng = random.Random(derive_seed(seed, index))
+    solution = SudokoGenarator.generate_sudoku(rng)
+    board = remove_clues([row[:] for row in solution], remove, rng)
+    _, meta = rate_board(board)
+    meta['techniques'] = format_trace(presolve(SudokuCSP(board)))
+    meta['key'] = canonical_form(board)[0]
+    meta['seed'] = seed
+    meta['index'] = index
+    return Puzzle(board, solution, meta)
+
+
+class PuzzleJob:
+    """A picklable make_puzzle for the indexes of one run."""
+
+    def __init__(self, seed, remove):
+        self.seed = seed
+        self.remove = remove
+
+    def __call__(self, index):
+        return make_puzzle(self.seed, index, self.remove)
+
+
+def produce(count, seed=0, remove=55, start=0, jobs=1, chunksize=8, stats=None):
+    """Yield the distinct puzzles among the indexes start .. start + count - 1 of the run seed, in
+    index order, made by a pool of jobs processes when jobs > 1. stats, a dict if given, gets the
+    numbers of 'made' and 'duplicates' puzzles."""
+    job = PuzzleJob(seed, remove)
+    indexes = range(start, start + count)
+    if stats is None:
+        stats = {}
+    stats.update(made=0, duplicates=0)
+    # blake2b digests of the keys, 16 bytes per puzzle instead of a string of 81
+    seen = set()
+    if jobs <= 1:
+        puzzles = map(job, indexes)
+        pool = None
+    else:
+        from multiprocessing import Pool
+        pool = Pool(jobs)
+        puzzles = pool.imap(job, indexes, chunksize)
+    try:
+        for puzzle in puzzles:
+            stats['made'] += 1
+            digest = hashlib.blake2b(puzzle.meta['key'].encode(), digest_size=16).digest()
+            if digest in seen:
+                stats['duplicates'] += 1
+                continue
+            seen.add(digest)
+            yield puzzle
+    finally:
+        if pool is not None:
+            pool.terminate()
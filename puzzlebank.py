@@ -0,0 +1,154 @@
+"""Packed binary puzzle bank read through mmap.
+
+Layout (little endian):
+    header  32 bytes: magic b'SDKBANK\\0', version (H), bits per cell (B), cells (B),
+            record size (I), number of records (Q), 8 reserved bytes
+    record  86 bytes: puzzle (41 bytes, 4 bits per cell, first cell in the high nibble),
+            solution (41 bytes, all zero when unknown), difficulty (H), clues (B), flags (B)
+
+Records have a fixed size so puzzle i is read from offset 32 + 86 * i without parsing
+anything else, whatever the size of the bank.
+
+Build a bank from any puzzle file puzzleio can read:
+    python puzzlebank.py puzzles.txt puzzles.bank
+"""
+
+import mmap
+import random
+import struct
+import sys
+
+from puzzleio import Puzzle
+
+MAGIC = b'SDKBANK\0'
+VERSION = 1
+HEADER = struct.Struct('<8sHBBIQ8x')
+RECORD = struct.Struct('<41s41sHBB')
+HAS_SOLUTION = 1
+
+# byte -> (high nibble, low nibble)
+_NIBBLES = [(b >> 4, b & 15) for b in range(256)]
+
+
+def pack_board(board):
+    cells = [int(v) for row in board for v in row] + [0]
+    return bytes((cells[k] << 4) | cells[k + 1] for k in range(0, 82, 2))
+
+
+def unpack_board(data):
+    cells = []
+    for b in data:
+        cells.extend(_NIBBLES[b])
+    return [cells[i:i + 9] for i in range(0, 81, 9)]
+
+
+class BankWriter:
+    """Append puzzles to a new bank; the header is completed on close()."""
+
+    def __init__(self, path):
+        self.f = open(path, 'wb')
+        self.count = 0
+        self.f.write(HEADER.pack(MAGIC, VERSION, 4, 81, RECORD.size, 0))
+
+    def append(self, puzzle):
+        difficulty = min(int(puzzle.meta.get('difficulty', 0)), 0xFFFF)
+        clues = sum(1 for row in puzzle.board for v in row if int(v))
+        flags = HAS_SOLUTION if puzzle.solution else 0
+        solution = pack_board(puzzle.solution) if puzzle.solution else bytes(41)
+        self.f.write(RECORD.pack(pack_board(puzzle.board), solution, difficulty, clues, flags))
+        self.count += 1
+
+    def close(self):
+        if self.f is not None:
+            self.f.seek(0)
+            self.f.write(HEADER.pack(MAGIC, VERSION, 4, 81, RECORD.size, self.count))
+            self.f.close()
+            self.f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_bank(puzzles, path):
+    """Write an iterable of Puzzle to a new bank and return how many were written."""
+    with BankWriter(path) as writer:
+        for puzzle in puzzles:
+            writer.append(puzzle)
+    return writer.count
+
+
+class PuzzleBank:
+    """Read-only random access to a bank: bank[i] is a Puzzle with meta 'difficulty' and 'clues'."""
+
+    def __init__(self, path):
+        self.f = open(path, 'rb')
+        self.data = None
+        try:
+            self.data = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, bits, cells, record_size, count = HEADER.unpack_from(self.data, 0)
+        except (ValueError, OSError, struct.error):
+            # an empty file cannot be mapped, a short one has no header
+            self.close()
+            raise ValueError('{} is not a puzzle bank'.format(path))
+        if magic != MAGIC or version != VERSION or (bits, cells, record_size) != (4, 81, RECORD.size):
+            self.close()
+            raise ValueError('{} is not a version {} puzzle bank'.format(path, VERSION))
+        if HEADER.size + count * record_size > len(self.data):
+            self.close()
+            raise ValueError('{} is truncated'.format(path))
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def _offset(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('puzzle bank index out of range')
+        return HEADER.size + index * RECORD.size
+
+    def __getitem__(self, index):
+        puzzle, solution, difficulty, clues, flags = RECORD.unpack_from(self.data, self._offset(index))
+        return Puzzle(unpack_board(puzzle), unpack_board(solution) if flags & HAS_SOLUTION else None,
+                      {'difficulty': difficulty, 'clues': clues})
+
+    def board(self, index):
+        offset = self._offset(index)
+        return unpack_board(self.data[offset:offset + 41])
+
+    def difficulty(self, index):
+        return struct.unpack_from('<H', self.data, self._offset(index) + 82)[0]
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def sample(self, rng=random, low=0, high=0xFFFF, tries=1000):
+        """Return the index of a random puzzle with low <= difficulty <= high, or None when
+        none is found in tries random picks."""
+        for _ in range(tries if self.count else 0):
+            index = rng.randrange(self.count)
+            if low <= self.difficulty(index) <= high:
+                return index
+        return None
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    from puzzleio import read_puzzles, rate_puzzles
+    print(write_bank(rate_puzzles(read_puzzles(sys.argv[1])), sys.argv[2]), 'puzzles written')
@@ -0,0 +1,226 @@
+"""Streaming readers and writers for puzzle files.
+
+Every reader is a generator that parses one puzzle at a time and every stage takes and
+returns an iterable of Puzzle, so a file of millions of puzzles can go through
+read -> solve -> rate -> filter -> write in constant memory, e.g.
+
+    puzzles = rate_puzzles(read_puzzles('all.txt'))
+    write_puzzles(filter_puzzles(puzzles, lambda p: p.meta['difficulty'] > 100), 'hard.csv')
+
+Formats:
+    lines   one puzzle per line, 81 chars, '0' or '.' for an empty cell
+    csv     a header with a 'puzzle' column, an optional 'solution' column, any other
+            column is kept as metadata
+    grid    9 lines of 9 cells per puzzle; spaces, '|', '-' and '+' are ignored and
+            puzzles are separated by blank lines
+"""
+
+import sys
+
+from sudokucsp import SudokuCSP
+from csp import backtracking_search, mrv, unordered_domain_values, forward_checking
+from solver import rate_board
+
+EMPTY = '0.'
+
+
+class Puzzle:
+    """A board (9x9 list of lists of ints, 0 for empty), its solution if known and a dict of metadata."""
+
+    def __init__(self, board, solution=None, meta=None):
+        self.board = board
+        self.solution = solution
+        self.meta = meta if meta is not None else {}
+
+
+def board_from_string(text):
+    """Return the board of an 81 chars string."""
+    if len(text) != 81:
+        raise ValueError('a puzzle needs 81 cells, got {}: {!r}'.format(len(text), text))
+    cells = [0 if c in EMPTY else int(c) for c in text]
+    return [cells[i:i + 9] for i in range(0, 81, 9)]
+
+
+def board_to_string(board, empty='0'):
+    return ''.join(str(v) if v else empty for row in board for v in row)
+
+
+# ______________________________________________________________________________
+# Readers
+
+
+def _open_input(source):
+    if source == '-':
+        return sys.stdin, False
+    if isinstance(source, str):
+        return open(source, newline=''), True
+    return source, False
+
+
+def _guess_format(source):
+    if isinstance(source, str):
+        if source.endswith('.csv'):
+            return 'csv'
+        if source.endswith('.grid'):
+            return 'grid'
+    return 'lines'
+
+
+def read_lines(f):
+    for line in f:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield Puzzle(board_from_string(line[:81]))
+
+
+def read_csv(f):
+    # csv (and the re module it loads) is imported only by the tools that use it
+    import csv
+    for row in csv.DictReader(f):
+        puzzle = Puzzle(board_from_string(row.pop('puzzle')))
+        solution = row.pop('solution', None)
+        if solution:
+            puzzle.solution = board_from_string(solution)
+        puzzle.meta = row
+        yield puzzle
+
+
+def read_grids(f):
+    cells = []
+    for line in f:
+        line = line.strip()
+        if not line or set(line) <= set('-+| '):
+            continue
+        cells.extend(c for c in line if c.isdigit() or c == '.')
+        if len(cells) >= 81:
+            yield Puzzle(board_from_string(''.join(cells[:81])))
+            cells = cells[81:]
+    if cells:
+        raise ValueError('incomplete grid at the end of the file ({} cells)'.format(len(cells)))
+
+
+READERS = {'lines': read_lines, 'csv': read_csv, 'grid': read_grids}
+
+
+def read_puzzles(source, fmt=None):
+    """Yield the puzzles of source (a path, '-' for stdin, or an open text file).
+    fmt is 'lines', 'csv' or 'grid', guessed from the file extension when not given."""
+    f, owned = _open_input(source)
+    try:
+        yield from READERS[fmt or _guess_format(source)](f)
+    finally:
+        if owned:
+            f.close()
+
+
+# ______________________________________________________________________________
+# Writers
+# the writers keep at most buffer_size formatted records in memory before writing them
+
+
+def _format_lines(puzzle):
+    return board_to_string(puzzle.board) + '\n'
+
+
+def _format_grid(puzzle):
+    return '\n'.join(' '.join(str(v) for v in row) for row in puzzle.board) + '\n\n'
+
+
+def _write(puzzles, f, format_record, buffer_size):
+    count = 0
+    buffer = []
+    for puzzle in puzzles:
+        buffer.append(format_record(puzzle))
+        count += 1
+        if len(buffer) >= buffer_size:
+            f.write(''.join(buffer))
+            buffer = []
+    f.write(''.join(buffer))
+    return count
+
+
+def write_lines(puzzles, f, buffer_size=4096):
+    return _write(puzzles, f, _format_lines, buffer_size)
+
+
+def write_grids(puzzles, f, buffer_size=4096):
+    return _write(puzzles, f, _format_grid, buffer_size)
+
+
+def write_csv(puzzles, f, fieldnames=None, buffer_size=4096):
+    """Write puzzles with their solution and metadata. The metadata columns are
+    fieldnames, or the keys of the first puzzle's meta when not given."""
+    import csv
+    import io
+    chunk = io.StringIO()
+    writer = None
+    count = 0
+    for puzzle in puzzles:
+        if writer is None:
+            columns = ['puzzle', 'solution'] + list(fieldnames if fieldnames is not None else puzzle.meta)
+            writer = csv.DictWriter(chunk, columns, extrasaction='ignore')
+            writer.writeheader()
+        row = dict(puzzle.meta)
+        row['puzzle'] = board_to_string(puzzle.board)
+        row['solution'] = board_to_string(puzzle.solution) if puzzle.solution else ''
+        writer.writerow(row)
+        count += 1
+        if count % buffer_size == 0:
+            f.write(chunk.getvalue())
+            chunk.seek(0)
+            chunk.truncate()
+    f.write(chunk.getvalue())
+    return count
+
+
+WRITERS = {'lines': write_lines, 'csv': write_csv, 'grid': write_grids}
+
+
+def write_puzzles(puzzles, target, fmt=None, **kwargs):
+    """Write puzzles to target (a path, '-' for stdout, or an open text file) and return
+    how many were written."""
+    if target == '-':
+        f, owned = sys.stdout, False
+    elif isinstance(target, str):
+        f, owned = open(target, 'w', newline=''), True
+    else:
+        f, owned = target, False
+    try:
+        return WRITERS[fmt or _guess_format(target)](puzzles, f, **kwargs)
+    finally:
+        if owned:
+            f.close()
+
+
+# ______________________________________________________________________________
+# Stages
+
+
+def solve_puzzles(puzzles, select_unassigned_variable=mrv, order_domain_values=unordered_domain_values,
+                  inference=forward_checking, cache=None):
+    """Fill puzzle.solution (None if there is no solution) and record the backtracks in meta['n_bt'].
+    A SolutionCache given as cache is checked before searching."""
+    for puzzle in puzzles:
+        s = SudokuCSP(puzzle.board)
+
+        def search(board):
+            a = backtracking_search(s, select_unassigned_variable, order_domain_values, inference)
+            return s.to_board(a) if a else None
+
+        puzzle.solution = search(puzzle.board) if cache is None else cache.solve(puzzle.board, search)
+        puzzle.meta['n_bt'] = s.n_bt
+        yield puzzle
+
+
+def rate_puzzles(puzzles):
+    """Record meta['clues'] and meta['difficulty'], the backtracks MRV with forward checking needs."""
+    for puzzle in puzzles:
+        solution, meta = rate_board(puzzle.board)
+        if puzzle.solution is None:
+            puzzle.solution = solution
+        puzzle.meta.update(meta)
+        yield puzzle
+
+
+def filter_puzzles(puzzles, predicate):
+    return (puzzle for puzzle in puzzles if predicate(puzzle))
@@ -0,0 +1,334 @@
+"""SAT backend: a CNF encoding of SudokuCSP and a small CDCL solver.
+
+The boolean variable x(cell, d) is true when the cell holds the digit d. The clauses say
+that every cell holds one digit of its domain, that two neighbors never hold the same
+digit and that every row, column and region holds every digit (redundant, but it lets
+unit propagation find the hidden singles). A Killer cage keeps out the digits of no sum
+combination, must hold the digits of all its combinations and cannot hold two digits
+that share no combination; the sums themselves are checked on the models, and a model
+breaking one gets a clause forbidding that filling of the cage before solving again.
+
+The CDCL solver has the usual parts: two watched literals per clause, first-UIP clause
+learning with non-chronological backjumps, VSIDS activities with phase saving and Luby
+restarts. A board that has no solution is usually refuted after a few conflicts, while
+backtracking_search may explore a large tree before giving up.
+
+    python sat.py puzzles.txt out/puzzle    writes out/puzzle0.cnf, out/puzzle1.cnf, ... (DIMACS)
+"""
+
+import heapq
+import sys
+
+
+def luby(i):
+    """Return the i-th term (from 0) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ..."""
+    size, power = 1, 0
+    while size < i + 1:
+        power += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        power -= 1
+        i %= size
+    return 1 << power
+
+
+class CDCL:
+    """A conflict-driven clause learning solver over the variables 1 .. num_vars; a literal is
+    a variable or its negation (-v). Clauses are added with add_clause, solve returns true,
+    false or None (max_conflicts reached) and the model is the set of the true variables.
+    Clauses can be added between two calls of solve, the learned clauses are kept."""
+
+    def __init__(self, num_vars, restart_base=100, decay=0.95):
+        self.num_vars = num_vars
+        self.restart_base = restart_base
+        self.decay = decay
+        # lists indexed by a literal, -v uses the negative indexes: value is 1 (true), -1 (false) or 0
+        self.value = [0] * (2 * num_vars + 1)
+        # the indexes of the clauses whose first or second literal is this literal
+        self.watches = [[] for _ in range(2 * num_vars + 1)]
+        self.level = [0] * (num_vars + 1)
+        self.reason = [None] * (num_vars + 1)
+        self.phase = [False] * (num_vars + 1)
+        self.activity = [0.0] * (num_vars + 1)
+        self.increment = 1.0
+        self.heap = [(0.0, v) for v in range(1, num_vars + 1)]
+        self.clauses = []
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.ok = True
+        self.model = None
+        self.stats = {'conflicts': 0, 'decisions': 0, 'propagations': 0, 'learned': 0, 'restarts': 0}
+
+    def add_clause(self, literals):
+        """Add a clause (an iterable of literals); return false if the clauses are now unsatisfiable."""
+        self.backtrack(0)
+        clause = []
+        for lit in set(literals):
+            if -lit in clause or self.value[lit] == 1:
+                return self.ok  # always true
+            if self.value[lit] == 0:
+                clause.append(lit)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+            self.ok = self.ok and self.propagate() is None
+        else:
+            self.attach(clause)
+        return self.ok
+
+    def attach(self, clause):
+        self.clauses.append(clause)
+        index = len(self.clauses) - 1
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    def enqueue(self, lit, reason):
+        v = abs(lit)
+        self.value[lit] = 1
+        self.value[-lit] = -1
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        """Unit propagation of the trail; return the index of a conflicting clause or None."""
+        value, watches, clauses, trail = self.value, self.watches, self.clauses, self.trail
+        while self.qhead < len(trail):
+            false_lit = -trail[self.qhead]
+            self.qhead += 1
+            self.stats['propagations'] += 1
+            watching = watches[false_lit]
+            kept = []
+            for position, index in enumerate(watching):
+                clause = clauses[index]
+                # the false literal goes second, the first one is the literal implied
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if value[first] == 1:
+                    kept.append(index)
+                    continue
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    if value[lit] != -1:
+                        clause[1], clause[k] = lit, false_lit
+                        watches[lit].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if value[first] == -1:
+                        kept.extend(watching[position + 1:])
+                        watches[false_lit] = kept
+                        self.qhead = len(trail)
+                        return index
+                    self.enqueue(first, index)
+            watches[false_lit] = kept
+        return None
+
+    def analyze(self, conflict):
+        """Return (learned clause, backjump level): the first-UIP clause of the conflict, its
+        asserting literal first and a literal of the backjump level second."""
+        current = len(self.trail_lim)
+        seen = set()
+        learned = [None]
+        pending = 0
+        lit = None
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for q in (clause if lit is None else clause[1:]):
+                v = abs(q)
+                if v not in seen and self.level[v] > 0:
+                    seen.add(v)
+                    self.bump(v)
+                    if self.level[v] == current:
+                        pending += 1
+                    else:
+                        learned.append(q)
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reason[abs(lit)]]
+        learned[0] = -lit
+        if len(learned) == 1:
+            return learned, 0
+        second = max(range(1, len(learned)), key=lambda k: self.level[abs(learned[k])])
+        learned[1], learned[second] = learned[second], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def bump(self, v):
+        self.activity[v] += self.increment
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[u], u) for u in range(1, self.num_vars + 1) if self.value[u] == 0]
+            heapq.heapify(self.heap)
+        heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def backtrack(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for lit in self.trail[start:]:
+            v = abs(lit)
+            self.value[lit] = self.value[-lit] = 0
+            self.reason[v] = None
+            self.phase[v] = lit > 0
+            heapq.heappush(self.heap, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def decide(self):
+        """Return the unassigned variable of highest activity, None if all are assigned."""
+        heap, value, activity = self.heap, self.value, self.activity
+        while heap:
+            a, v = heapq.heappop(heap)
+            # an entry is stale when the variable is assigned or was bumped after the push
+            if value[v] == 0 and -a == activity[v]:
+                return v
+        return None
+
+    def solve(self, max_conflicts=None):
+        """Return true (self.model is set), false (no model) or None after max_conflicts conflicts."""
+        self.model = None
+        self.backtrack(0)
+        if not self.ok or self.propagate() is not None:
+            self.ok = False
+            return False
+        restarts = 0
+        budget = luby(0) * self.restart_base
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.stats['conflicts'] += 1
+                conflicts += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.enqueue(learned[0], None)
+                else:
+                    self.stats['learned'] += 1
+                    self.enqueue(learned[0], self.attach(learned))
+                self.increment /= self.decay
+                if max_conflicts is not None and self.stats['conflicts'] >= max_conflicts:
+                    self.backtrack(0)
+                    return None
+            elif conflicts >= budget:
+                restarts += 1
+                self.stats['restarts'] += 1
+                budget = luby(restarts) * self.restart_base
+                conflicts = 0
+                self.backtrack(0)
+            else:
+                v = self.decide()
+                if v is None:
+                    self.model = {lit for lit in self.trail if lit > 0}
+                    self.backtrack(0)
+                    return True
+                self.stats['decisions'] += 1
+                self.trail_lim.append(len(self.trail))
+                self.enqueue(v if self.phase[v] else -v, None)
+
+
+# ______________________________________________________________________________
+# Sudoku encoding
+
+
+def encode(csp):
+    """Return (clauses, num_vars) for the SudokuCSP csp. The variable of the k-th value of
+    csp.digits() in the i-th variable of csp.variables is i * csp.size + k + 1."""
+    n = csp.size
+    digits = csp.digits()
+    number = {var: i * n for i, var in enumerate(csp.variables)}
+    clauses = []
+    for var in csp.variables:
+        base = number[var]
+        allowed = set(csp.domains[var])
+        clauses.append([base + k + 1 for k, d in enumerate(digits) if d in allowed])
+        clauses.extend([-(base + k + 1)] for k, d in enumerate(digits) if d not in allowed)
+        for k in range(n):
+            for m in range(k + 1, n):
+                clauses.append([-(base + k + 1), -(base + m + 1)])
+        for other in csp.neighbors[var]:
+            if number[other] > base:
+                clauses.extend([-(base + k + 1), -(number[other] + k + 1)] for k in range(n))
+    for unit in csp.units:
+        for k in range(n):
+            clauses.append([number[var] + k + 1 for var in unit])
+    for cage in csp.nary:
+        cells, combinations = cage.scope, cage.combinations
+        allowed, required = 0, ~0
+        for combination in combinations:
+            allowed |= combination
+            required &= combination
+        for var in cells:
+            clauses.extend([-(number[var] + k + 1)] for k in range(n) if not allowed >> (k + 1) & 1)
+        for k in range(n):
+            if combinations and required >> (k + 1) & 1:
+                clauses.append([number[var] + k + 1 for var in cells])
+        # two digits of no common combination cannot both be in the cage
+        for k in range(n):
+            for m in range(k + 1, n):
+                both = 1 << (k + 1) | 1 << (m + 1)
+                if allowed & both == both and not any(c & both == both for c in combinations):
+                    clauses.extend([-(number[a] + k + 1), -(number[b] + m + 1)]
+                                   for a in cells for b in cells if a != b)
+    return clauses, n * len(csp.variables)
+
+
+def decode(csp, model):
+    """Return the assignment {var: value} of a model of encode(csp)."""
+    n = csp.size
+    digits = csp.digits()
+    return {var: digits[k] for i, var in enumerate(csp.variables) for k in range(n) if i * n + k + 1 in model}
+
+
+def sat_solve(csp, max_conflicts=None):
+    """Return (assignment or None, stats of the CDCL solver) for the SudokuCSP csp.
+    The assignment is also None when max_conflicts conflicts were not enough."""
+    clauses, num_vars = encode(csp)
+    solver = CDCL(num_vars)
+    for clause in clauses:
+        if not solver.add_clause(clause):
+            return None, solver.stats
+    n = csp.size
+    number = {var: i * n for i, var in enumerate(csp.variables)}
+    while solver.solve(max_conflicts):
+        assignment = decode(csp, solver.model)
+        wrong = [cage.scope for cage in csp.nary if sum(int(assignment[var]) for var in cage.scope) != cage.total]
+        if not wrong:
+            return assignment, solver.stats
+        for cells in wrong:
+            solver.add_clause([-(number[var] + int(assignment[var])) for var in cells])
+    return None, solver.stats
+
+
+def write_dimacs(clauses, num_vars, f, comments=()):
+    """Write the clauses in the DIMACS CNF format to the open text file f."""
+    lines = ['c ' + comment for comment in comments]
+    lines.append('p cnf {} {}'.format(num_vars, len(clauses)))
+    lines.extend(' '.join(map(str, clause)) + ' 0' for clause in clauses)
+    f.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    from puzzleio import read_puzzles, board_to_string
+    from sudokucsp import SudokuCSP
+    for number, puzzle in enumerate(read_puzzles(sys.argv[1])):
+        with open('{}{}.cnf'.format(sys.argv[2], number), 'w') as out:
+            s = SudokuCSP(puzzle.board)
+            write_dimacs(*encode(s), out, ['sudoku ' + board_to_string(puzzle.board),
+                                           'variable i * {} + k + 1: cell i holds the digit k + 1'.format(s.size)])
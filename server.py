@@ -0,0 +1,294 @@
+"""A small asyncio HTTP/JSON service for the solver.
+
+    python server.py --port 8080 --workers 4
+
+Endpoints (bodies and answers are JSON, boards are 81 chars strings with '0' or '.' for empty):
+    POST /solve     {"puzzle": ..., "engine", "inference", "heuristic", "order", "max_steps",
+                     "seed", "max_conflicts" optional}
+                    -> {"solution": ... or null, "stats": {...}}
+    POST /validate  {"puzzle": ..., "solution": ...} -> {"valid": true/false}
+    POST /generate  {"remove": 40 optional} -> {"puzzle": ..., "solution": ...}
+    POST /rate      {"puzzle": ...} -> {"clues": ..., "difficulty": ...}
+    GET  /metrics   counters of the service
+
+Every solve and rate has a budget: the backtracking search stops after max_nodes choices or
+max_seconds and the request is answered with 504; the max_steps of minconflicts and the
+max_conflicts of sat are capped. solve, generate and rate are queued and sent to a process
+pool in small batches (up to batch_size jobs, waiting at most batch_delay seconds to fill a
+batch). The queue is bounded: when it is full the request is answered at once with 503.
+validate is cheap enough to be answered on the event loop. Connections are kept alive
+(HTTP/1.1).
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from puzzleio import board_from_string, board_to_string
+from verifier import is_solution
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable',
+           504: 'Gateway Timeout'}
+MAX_BODY = 64 * 1024
+POOLED = ('/solve', '/generate', '/rate')
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+# ______________________________________________________________________________
+# Jobs, run in the worker processes
+
+
+def run_job(path, request, budget=(None, None)):
+    """budget is (max_nodes, max_seconds) of a search, also the cap of max_steps and max_conflicts."""
+    from solver import solve_board, rate_board, generate_board, Budget
+    max_nodes, max_seconds = budget
+    if path == '/solve':
+        options = {k: request[k] for k in ('engine', 'inference', 'heuristic', 'order', 'max_steps', 'seed',
+                                       'max_conflicts') if k in request}
+        engine = options.get('engine', 'backtracking')
+        if engine == 'backtracking':
+            options['monitor'] = Budget(max_nodes, max_seconds)
+        elif max_nodes is not None:
+            key = 'max_steps' if engine == 'minconflicts' else 'max_conflicts'
+            options[key] = min(int(options.get(key) or max_nodes), max_nodes)
+        solution, stats = solve_board(board_from_string(request['puzzle']), **options)
+        return {'solution': board_to_string(solution) if solution else None, 'stats': stats}
+    if path == '/rate':
+        _, meta = rate_board(board_from_string(request['puzzle']), Budget(max_nodes, max_seconds))
+        return meta
+    puzzle, solution = generate_board(int(request.get('remove', 40)))
+    return {'puzzle': board_to_string(puzzle), 'solution': board_to_string(solution)}
+
+
+def run_batch(jobs, budget=(None, None)):
+    """Run a batch of (path, request) jobs; a failing job gives an {'error': ..., 'status': ...} answer."""
+    from solver import BudgetExceeded
+    results = []
+    for path, request in jobs:
+        try:
+            results.append(run_job(path, request, budget))
+        except BudgetExceeded as e:
+            results.append({'error': 'the search went over its budget: {}'.format(e), 'status': 504})
+        except (KeyError, ValueError, TypeError) as e:
+            results.append({'error': '{}: {}'.format(type(e).__name__, e), 'status': 400})
+    return results
+
+
+# ______________________________________________________________________________
+# Service
+
+
+class SolveService:
+
+    def __init__(self, workers=2, batch_size=8, batch_delay=0.005, queue_size=256, idle_timeout=30,
+                 max_nodes=200000, max_seconds=10.0):
+        self.workers = workers
+        self.budget = (max_nodes, max_seconds)
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.idle_timeout = idle_timeout
+        self.queue = asyncio.Queue(queue_size)
+        self.pool = None
+        self.slots = asyncio.Semaphore(workers)
+        self.tasks = set()
+        self.started = time.time()
+        self.metrics = {'requests': {}, 'errors': 0, 'rejected': 0, 'connections': 0,
+                        'batches': 0, 'batched_jobs': 0, 'job_seconds': 0.0}
+
+    # batching
+
+    async def submit(self, path, request):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((path, request, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.metrics['rejected'] += 1
+            raise HTTPError(503, 'too many requests queued, try again later')
+        return await future
+
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # at most one batch per worker in flight, the others wait in the bounded queue
+            await self.slots.acquire()
+            task = asyncio.create_task(self.run(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.pool, run_batch, [(p, r) for p, r, _, _ in batch],
+                                                 self.budget)
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            self.slots.release()
+        self.metrics['batches'] += 1
+        self.metrics['batched_jobs'] += len(batch)
+        now = time.perf_counter()
+        for (_, _, future, queued), result in zip(batch, results):
+            self.metrics['job_seconds'] += now - queued
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    # HTTP
+
+    async def handle(self, path, method, body):
+        self.metrics['requests'][path] = self.metrics['requests'].get(path, 0) + 1
+        if path == '/metrics':
+            if method != 'GET':
+                raise HTTPError(405, 'use GET')
+            return self.report()
+        if path not in POOLED and path != '/validate':
+            raise HTTPError(404, 'unknown endpoint ' + path)
+        if method != 'POST':
+            raise HTTPError(405, 'use POST')
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(400, 'the body is not JSON')
+        if not isinstance(request, dict):
+            raise HTTPError(400, 'the body must be a JSON object')
+        if path == '/validate':
+            try:
+                return {'valid': is_solution(request['solution'], request.get('puzzle'))}
+            except (KeyError, TypeError) as e:
+                raise HTTPError(400, 'bad request: {}'.format(e))
+        result = await self.submit(path, request)
+        if 'error' in result:
+            raise HTTPError(result.get('status', 400), result['error'])
+        return result
+
+    def report(self):
+        batches = self.metrics['batches']
+        report = dict(self.metrics)
+        report['queued'] = self.queue.qsize()
+        report['uptime'] = round(time.time() - self.started, 3)
+        report['mean_batch_size'] = round(self.metrics['batched_jobs'] / batches, 3) if batches else 0
+        report['mean_job_seconds'] = (round(self.metrics['job_seconds'] / self.metrics['batched_jobs'], 6)
+                                      if self.metrics['batched_jobs'] else 0)
+        return report
+
+    async def read_request(self, reader):
+        """Return (method, path, headers, body) or None when the client closed the connection."""
+        line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+        if not line:
+            return None
+        try:
+            method, path, version = line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, 'bad request line')
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, 'bad Content-Length')
+        if length < 0:
+            raise HTTPError(400, 'bad Content-Length')
+        if length > MAX_BODY:
+            raise HTTPError(413, 'the body is too large')
+        body = await reader.readexactly(length) if length else b''
+        if version == 'HTTP/1.0' and headers.get('connection', '').lower() != 'keep-alive':
+            headers['connection'] = 'close'
+        return method, path.split('?')[0], headers, body
+
+    async def connection(self, reader, writer):
+        self.metrics['connections'] += 1
+        try:
+            while True:
+                # a request that could not be read leaves the stream in an unknown state: close it
+                keep_alive = False
+                try:
+                    request = await self.read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    status, answer = 200, await self.handle(path, method, body)
+                except HTTPError as e:
+                    self.metrics['errors'] += 1
+                    status, answer = e.status, {'error': str(e)}
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    self.metrics['errors'] += 1
+                    status, answer = 500, {'error': '{}: {}'.format(type(e).__name__, e)}
+                data = json.dumps(answer).encode()
+                writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n'
+                             'Connection: {}\r\n\r\n'.format(status, REASONS[status], len(data),
+                                                             'keep-alive' if keep_alive else 'close').encode()
+                             + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080, ready=None):
+        """Serve until cancelled; ready, if given, is called with the asyncio server once listening."""
+        # forked workers would inherit the sockets accepted so far and keep them open after close
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('forkserver'))
+        batcher = asyncio.create_task(self.batcher())
+        server = await asyncio.start_server(self.connection, host, port)
+        try:
+            if ready is not None:
+                ready(server)
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.pool.shutdown(cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sudoku solving service (HTTP/JSON).')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=2, help='processes of the pool')
+    parser.add_argument('--batch-size', type=int, default=8, help='jobs sent to a worker at once')
+    parser.add_argument('--batch-delay', type=float, default=0.005, help='seconds to wait to fill a batch')
+    parser.add_argument('--queue-size', type=int, default=256, help='queued jobs before answering 503')
+    parser.add_argument('--max-nodes', type=int, default=200000, help='search nodes of a puzzle before 504')
+    parser.add_argument('--max-seconds', type=float, default=10.0, help='search seconds of a puzzle before 504')
+    args = parser.parse_args()
+    service = SolveService(args.workers, args.batch_size, args.batch_delay, args.queue_size,
+                           max_nodes=args.max_nodes, max_seconds=args.max_seconds)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
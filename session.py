@@ -0,0 +1,135 @@
+"""A solving session for a board that is edited between the solves.
+
+The session keeps the board, the domains the givens leave to every cell and the last
+solution found. Editing a cell only recomputes the domains of the cell and of its peers,
+and the last solution stays the answer while it agrees with the new given (emptying a
+cell never breaks it). Only when it does not does solve search again, starting from the
+kept domains and trying first, in every cell, the value of the last solution, which
+is the right one almost everywhere after a small edit. A failed search is remembered
+too, until an edit removes or changes a given.
+
+    session = SolveSession(board)
+    session.set(4, 2, 7)
+    if not session.is_solvable():
+        ...
+"""
+
+from csp import backtracking_search, mrv, unordered_domain_values, forward_checking
+from presolver import presolve
+from sudokucsp import SudokuCSP
+
+
+class SolveSession:
+
+    def __init__(self, board):
+        self.board = [row[:] for row in board]
+        self.size = len(board)
+        # for the variables, the neighbors and the digits, the search uses its own csp
+        self.structure = SudokuCSP(self.board)
+        self.index = {var: k for k, var in enumerate(self.structure.variables)}
+        # the given value of every cell or the digits no given neighbor holds
+        self.domains = {}
+        # the empty cells without a digit left and the givens repeated in a row, column or square
+        self.empty = set()
+        self.conflicts = set()
+        for var in self.structure.variables:
+            self._update(var)
+        self.solution = None
+        # true when the last search failed: adding a given cannot make the board solvable again
+        self.unsolvable = False
+        # the last solution as an assignment, kept to order the values of the next search
+        self.guide = {}
+        self.csp = None
+        self.trace = []
+        # counts the edits, a search started before the last one does not tell about the board
+        self.version = 0
+
+    def _value(self, var):
+        k = self.index[var]
+        return self.board[k // self.size][k % self.size]
+
+    def _update(self, var):
+        value = self._value(var)
+        taken = {str(self._value(other)) for other in self.structure.neighbors[var]}
+        self.empty.discard(var)
+        self.conflicts.discard(var)
+        if value:
+            self.domains[var] = [str(value)]
+            if str(value) in taken:
+                self.conflicts.add(var)
+        else:
+            self.domains[var] = [d for d in self.structure.digits() if d not in taken]
+            if not self.domains[var]:
+                self.empty.add(var)
+
+    def set(self, row, col, value):
+        """Put value (0 to empty the cell) in the cell of the board."""
+        self.version += 1
+        if self.board[row][col] or not value:
+            self.unsolvable = False
+        self.board[row][col] = value
+        var = self.structure.variables[row * self.size + col]
+        self._update(var)
+        for other in self.structure.neighbors[var]:
+            self._update(other)
+        if self.solution is not None and value and self.solution[row][col] != value:
+            self.solution = None
+
+    def check(self):
+        """Return false if the board has no solution for sure (an empty domain or a repeated given),
+        true if the last solution is still one, None if a search is needed to know."""
+        if self.empty or self.conflicts or self.unsolvable:
+            return False
+        return True if self.solution is not None else None
+
+    def solve(self, select_unassigned_variable=mrv, order_domain_values=unordered_domain_values,
+              inference=forward_checking, logic=False):
+        """Return a solution board or None. The search, if any, is made on self.csp (None when
+        check answered), after the techniques of presolver.py when logic is true (their trace
+        is in self.trace)."""
+        known = self.check()
+        if known is not None:
+            self.csp, self.trace = None, []
+            return self.solution if known else None
+        search = self.search(select_unassigned_variable, order_domain_values, inference, logic)
+        return self.finish(self.version, search())
+
+    def search(self, select_unassigned_variable=mrv, order_domain_values=unordered_domain_values,
+               inference=forward_checking, logic=False):
+        """Return a function making the search of solve on copies of the board and of the domains,
+        so it can run in another thread while the board is edited. Its result goes to finish."""
+        s = SudokuCSP(self.board)
+        s.curr_domains = {var: list(self.domains[var]) for var in s.variables}
+        s.support_pruning()
+        guide = dict(self.guide)
+
+        def guided(var, assignment, csp):
+            values = order_domain_values(var, assignment, csp)
+            value = guide.get(var)
+            if value in values:
+                return [value] + [v for v in values if v != value]
+            return values
+
+        def run():
+            trace = presolve(s) if logic else []
+            return s, trace, backtracking_search(s, select_unassigned_variable, guided, inference)
+
+        return run
+
+    def finish(self, version, result):
+        """Keep the result of a search started at version (self.version then) and return the
+        solution board or None. A search older than the last edit is ignored: None is returned
+        and check() still answers None."""
+        if version != self.version:
+            return None
+        s, self.trace, a = result
+        self.csp = s
+        if a:
+            self.guide = dict(a)
+            self.solution = s.to_board(a)
+        else:
+            self.unsolvable = True
+        return self.solution
+
+    def is_solvable(self):
+        return self.solve() is not None
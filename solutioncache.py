@@ -0,0 +1,245 @@
+"""Solution cache keyed by the canonical (min-lex) form of a board.
+
+Two puzzles that only differ by relabeling the digits, transposing the board, swapping
+bands/stacks or swapping rows/columns inside a band/stack have the same canonical form,
+so the solution of one of them can be mapped back through the transform and reused.
+"""
+
+import collections
+import functools
+from itertools import permutations
+
+from puzzleio import board_from_string, board_to_string
+
+# a board with fewer clues has more than one solution: there is nothing to cache
+MIN_CLUES = 17
+# the cache gives up on the boards with more transforms tying on a prefix (sparse or symmetric
+# boards, an empty one ties on all of them) and lets the solver answer
+MAX_CANDIDATES = 20000
+
+
+@functools.lru_cache(maxsize=None)
+def column_orders():
+    """The 1296 column orders that keep the stacks together (6 stack orders, 6 orders inside every stack).
+    Built on first use, not at import."""
+    return [tuple(3 * s + c for s, inner in zip(stacks, inners) for c in inner)
+            for stacks in permutations(range(3))
+            for inners in ((a, b, c)
+                           for a in permutations(range(3))
+                           for b in permutations(range(3))
+                           for c in permutations(range(3)))]
+
+
+class Transform:
+    """Maps a board to its canonical form: canonical[i][j] = labels[grid[rows[i]][columns[j]]]
+    where grid is the board, transposed if transposed is true. labels maps every digit 1-9."""
+
+    def __init__(self, transposed, rows, columns, labels):
+        self.transposed = transposed
+        self.rows = rows
+        self.columns = columns
+        self.labels = labels
+
+    def apply(self, board):
+        grid = _transpose(board) if self.transposed else board
+        return [[self.labels.get(int(grid[r][c]), 0) for c in self.columns] for r in self.rows]
+
+    def invert(self, canonical):
+        digits = {label: digit for digit, label in self.labels.items()}
+        grid = [[0] * 9 for _ in range(9)]
+        for i, r in enumerate(self.rows):
+            for j, c in enumerate(self.columns):
+                grid[r][c] = digits.get(canonical[i][j], 0)
+        return _transpose(grid) if self.transposed else grid
+
+
+def _transpose(board):
+    return [list(column) for column in zip(*board)]
+
+
+def _label_row(values, labels, next_label):
+    """Relabel a row by order of first appearance, 0 (empty) stays 0."""
+    row = []
+    copied = False
+    for v in values:
+        if v:
+            label = labels.get(v)
+            if label is None:
+                if not copied:
+                    labels = dict(labels)
+                    copied = True
+                label = labels[v] = next_label
+                next_label += 1
+            row.append(label)
+        else:
+            row.append(0)
+    return tuple(row), labels, next_label
+
+
+def _first_rows(grids):
+    """Return (first row of the key, candidates tied on it) without trying the 2592 column
+    orders on the 18 rows, or None if a row of a grid repeats a digit.
+
+    With different digits the first row is labeled 1, 2, 3 ... in order, so its min-lex form
+    only depends on where its empty cells go: first the stacks with the most empty cells, the
+    empty cells first in every stack. Only the rows with the most such leading empty cells
+    are kept, with the column orders that bring their empty cells first."""
+    best, rows = None, []
+    for g, grid in enumerate(grids):
+        for r, source in enumerate(grid):
+            digits = [v for v in source if v]
+            if len(set(digits)) != len(digits):
+                return None
+            empty = [sum(1 for c in range(3 * s, 3 * s + 3) if not source[c]) for s in range(3)]
+            invariant = sorted(empty, reverse=True)
+            if best is None or invariant > best:
+                best, rows = invariant, []
+            if invariant == best:
+                rows.append((g, r, empty))
+    row, candidates = [], []
+    for g, r, empty in rows:
+        source = grids[g][r]
+        for columns in column_orders():
+            # the empty cells first, in the stacks with the most of them
+            if [empty[columns[3 * s] // 3] for s in range(3)] != best:
+                continue
+            if any(source[columns[c]] and not source[columns[c + 1]] for c in range(8) if c % 3 != 2):
+                continue
+            row, labels, next_label = _label_row([source[c] for c in columns], {}, 1)
+            candidates.append((g, (r,), columns, labels, next_label))
+    return list(row), candidates
+
+
+def canonical_form(board, max_candidates=None):
+    """Return (key, transform): key is the 81 chars string of the min-lex equivalent board.
+    The rows are fixed one at a time and only the transforms that tie on the smallest
+    prefix are kept, so it is exact without trying all the 3 million transforms. With
+    max_candidates, return None as soon as more transforms than that tie."""
+    grids = ([[int(v) for v in row] for row in board],)
+    grids += (_transpose(grids[0]),)
+    # a candidate is (grid index, source rows so far, column order, labels, next free label)
+    first = _first_rows(grids)
+    if first is None:
+        candidates = [(g, (), columns, {}, 1) for g in range(2) for columns in column_orders()]
+        key = []
+    else:
+        key, candidates = first
+    for i in range(len(key) // 9, 9):
+        best = None
+        kept = []
+        for g, rows, columns, labels, next_label in candidates:
+            if i % 3 == 0:
+                used = {r // 3 for r in rows}
+                choices = [r for band in range(3) if band not in used for r in range(3 * band, 3 * band + 3)]
+            else:
+                band = rows[-1] // 3
+                choices = [r for r in range(3 * band, 3 * band + 3) if r not in rows]
+            grid = grids[g]
+            for r in choices:
+                source = grid[r]
+                row, row_labels, row_next = _label_row([source[c] for c in columns], labels, next_label)
+                if best is None or row < best:
+                    best = row
+                    kept = []
+                if row == best:
+                    kept.append((g, rows + (r,), columns, row_labels, row_next))
+        candidates = kept
+        if max_candidates is not None and len(candidates) > max_candidates:
+            return None
+        key.extend(best)
+
+    g, rows, columns, labels, next_label = candidates[0]
+    labels = dict(labels)
+    for digit in range(1, 10):
+        if digit not in labels:
+            labels[digit] = next_label
+            next_label += 1
+    return ''.join(map(str, key)), Transform(g == 1, rows, columns, labels)
+
+
+class SolutionCache:
+    """A bounded LRU of canonical puzzle -> canonical solution, optionally backed by a dbm
+    file (path) so the solutions survive restarts. Only 9x9 boards are cached."""
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.store = None
+        if path:
+            import dbm
+            self.store = dbm.open(path, 'c')
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _lookup(self, key):
+        solution = self.entries.get(key)
+        if solution is not None:
+            self.entries.move_to_end(key)
+        elif self.store is not None and key in self.store:
+            solution = self.store[key].decode()
+            self._remember(key, solution)
+        return solution
+
+    def _remember(self, key, solution):
+        self.entries[key] = solution
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def _canonical(self, board):
+        """Return canonical_form(board), or None for the boards that are not cached: not 9x9,
+        fewer than MIN_CLUES clues or too many tying transforms."""
+        if len(board) != 9 or sum(1 for row in board for v in row if int(v)) < MIN_CLUES:
+            return None
+        return canonical_form(board, MAX_CANDIDATES)
+
+    def get(self, board):
+        """Return the cached solution of board (a new list of lists) or None."""
+        canonical = self._canonical(board)
+        if canonical is None:
+            self.misses += 1
+            return None
+        key, transform = canonical
+        solution = self._lookup(key)
+        if solution is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return transform.invert(board_from_string(solution))
+
+    def put(self, board, solution):
+        canonical = self._canonical(board)
+        if canonical is not None:
+            self._add(*canonical, solution)
+
+    def _add(self, key, transform, solution):
+        canonical = board_to_string(transform.apply(solution))
+        self._remember(key, canonical)
+        if self.store is not None:
+            self.store[key] = canonical
+
+    def solve(self, board, solver):
+        """Return the solution of board from the cache, or call solver(board) and cache its
+        result. solver must return a solved board (list of lists) or None."""
+        canonical = self._canonical(board)
+        if canonical is None:
+            self.misses += 1
+            return solver(board)
+        key, transform = canonical
+        solution = self._lookup(key)
+        if solution is not None:
+            self.hits += 1
+            return transform.invert(board_from_string(solution))
+        self.misses += 1
+        result = solver(board)
+        if result is not None:
+            self._add(key, transform, result)
+        return result
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
@@ -0,0 +1,140 @@
+"""Solve, rate and generate boards by strategy name.
+
+This is the layer shared by the tools that do not build the CSP themselves (the service,
+the batch tools): strategies are picked by the names below so they can come from a
+request or a command line, and every function takes and returns plain boards.
+"""
+
+import sys
+import time
+import warnings
+
+from csp import (backtracking_search, backtracking_solutions, first_unassigned_variable, mrv,
+                 unordered_domain_values, lcv, no_inference, forward_checking, mac)
+from sudokucsp import SudokuCSP
+
+
+INFERENCES = {'none': no_inference, 'fc': forward_checking, 'mac': mac}
+HEURISTICS = {'first': first_unassigned_variable, 'mrv': mrv}
+ORDERS = {'unordered': unordered_domain_values, 'lcv': lcv}
+
+
+class BudgetExceeded(Exception):
+    """Raised by a Budget when a search goes over it."""
+
+
+class Budget:
+    """A monitor for backtracking that stops the search (BudgetExceeded) after max_nodes choices of
+    a variable or max_seconds, the limits that are not None."""
+
+    def __init__(self, max_nodes=None, max_seconds=None):
+        self.max_nodes = max_nodes
+        self.deadline = None if max_seconds is None else time.monotonic() + max_seconds
+        self.nodes = 0
+
+    def __call__(self, csp, assignment):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise BudgetExceeded('more than {} nodes'.format(self.max_nodes))
+        # the clock is read every 256 nodes only
+        if self.deadline is not None and not self.nodes & 0xFF and time.monotonic() > self.deadline:
+            raise BudgetExceeded('out of time')
+
+
+def backtracking(board, inference='fc', heuristic='mrv', order='unordered', monitor=None):
+    """Return (solution board or None, stats) using backtracking_search. monitor, if given, is
+    called with (csp, assignment) before every choice of a variable and can raise to stop the
+    search (see asyncsolver.py)."""
+    s = SudokuCSP(board)
+    select = HEURISTICS[heuristic]
+    if monitor is not None:
+        def select(assignment, csp, select=select):
+            monitor(csp, assignment)
+            return select(assignment, csp)
+    a = backtracking_search(s, select, ORDERS[order], INFERENCES[inference])
+    return (s.to_board(a) if a else None), {'n_bt': s.n_bt, 'nassigns': s.nassigns}
+
+
+def minconflicts(board, max_steps=100000, seed=None):
+    """Return (solution board or None, stats) using the min-conflicts local search."""
+    from localsearch import min_conflicts
+    s = SudokuCSP(board)
+    a = min_conflicts(s, max_steps, rng=seed)
+    return (s.to_board(a) if a else None), {'nassigns': s.nassigns}
+
+
+def cdcl(board, max_conflicts=None):
+    """Return (solution board or None, stats) with the CNF encoding and the CDCL solver of sat.py."""
+    from sat import sat_solve
+    s = SudokuCSP(board)
+    a, stats = sat_solve(s, max_conflicts)
+    return (s.to_board(a) if a else None), dict(stats)
+
+
+ENGINES = {'backtracking': backtracking, 'minconflicts': minconflicts, 'sat': cdcl}
+
+# functions called with (peak bytes, stats) after every solve_board(..., measure_memory=True),
+# e.g. a worker can log or export the memory of its solves
+memory_hooks = []
+
+
+def solve_board(board, engine='backtracking', measure_memory=False, **options):
+    """Return (solution board or None, stats) with the engine of that name; options go to the engine.
+    With measure_memory the solve is traced with tracemalloc (slower) and stats gets 'peak_bytes',
+    the peak of the memory allocated during the solve.
+    This blocks: from a coroutine use asyncsolver.py, a warning is issued when an event loop runs."""
+    if 'asyncio' in sys.modules and sys.modules['asyncio']._get_running_loop() is not None:
+        warnings.warn('solve_board blocks the running event loop, use asyncsolver.AsyncSolver.solve',
+                      RuntimeWarning, stacklevel=2)
+    if not measure_memory:
+        return ENGINES[engine](board, **options)
+    import tracemalloc
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    try:
+        solution, stats = ENGINES[engine](board, **options)
+        stats['peak_bytes'] = tracemalloc.get_traced_memory()[1] - start
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    for hook in memory_hooks:
+        hook(stats['peak_bytes'], stats)
+    return solution, stats
+
+
+def solutions(board, inference='fc', heuristic='mrv', order='unordered'):
+    """Yield the solution boards of board one by one, all from the same search."""
+    s = SudokuCSP(board)
+    for a in backtracking_solutions(s, HEURISTICS[heuristic], ORDERS[order], INFERENCES[inference]):
+        yield s.to_board(a)
+
+
+def count_solutions(board, limit=None, inference='fc', heuristic='mrv'):
+    """Return the number of solutions of board, stopping at limit when given: limit=2 tells a
+    proper puzzle (1) from a broken one (0) or an ambiguous one (2)."""
+    count = 0
+    for _ in solutions(board, inference, heuristic):
+        count += 1
+        if count == limit:
+            break
+    return count
+
+
+def rate_board(board, monitor=None):
+    """Return (solution board or None, meta) where meta has the 'clues' and the 'difficulty'
+    of board, the backtracks MRV with forward checking needs (monitor as for backtracking)."""
+    solution, stats = backtracking(board, 'fc', 'mrv', monitor=monitor)
+    clues = sum(1 for row in board for v in row if int(v))
+    return solution, {'clues': clues, 'difficulty': stats['n_bt']}
+
+
+def generate_board(num_to_remove=40):
+    """Return (puzzle, solution): a new full board and a copy with num_to_remove cells emptied."""
+    import SudokoGenarator
+    solution = SudokoGenarator.generate_sudoku()
+    puzzle = [row[:] for row in solution]
+    SudokoGenarator.remove_numbers(puzzle, num_to_remove)
+    return puzzle, solution
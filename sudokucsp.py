@@ -2,76 +2,250 @@
 # from original import * ... original is the one of AIMA's code
 # but this class doesnt do anything different, i mean it will be the same if it
 # extends the class on csp.py or original.py since both class are almost the same
+import functools
+import itertools
+import math
+from types import MappingProxyType
+
 from csp import *
+from verifier import is_complete_solution
+
+
+@functools.lru_cache(maxsize=None)
+def sum_combinations(n, k, total):
+    """Return the sets of k different digits from 1 to n adding up to total, as bitmasks
+    (bit d set for the digit d). The table of a cage is computed once and shared."""
+    return tuple(sum(1 << d for d in digits) for digits in itertools.combinations(range(1, n + 1), k)
+                 if sum(digits) == total)
+
+
+class Cage(Sum):
+    """A Killer cage: a Sum of different digits from 1 to size. Its sets of digits are known
+    (sum_combinations), so allows and prune check them instead of the bounds of Sum."""
+
+    def __init__(self, scope, total, size):
+        Sum.__init__(self, scope, total)
+        self.combinations = sum_combinations(size, len(self.scope), total)
+
+    def allows(self, csp, var, val, assignment):
+        """Return true if a combination holds val and the digits assigned to the rest of the cage."""
+        mask = 1 << int(val)
+        for other in self.scope:
+            if other != var and other in assignment:
+                mask |= 1 << int(assignment[other])
+        return any(combination & mask == mask for combination in self.combinations)
+
+    def prune(self, csp, assignment, removals):
+        """Prune the digits of no combination that the current domains still allow (every cell can
+        take a digit of the combination and together they cover it). The assigned cells have one
+        value left, assignment is not needed. Return false if no combination is left."""
+        masks = []
+        for var in self.scope:
+            mask = 0
+            for val in csp.curr_domains[var]:
+                mask |= 1 << int(val)
+            masks.append(mask)
+        covered = 0
+        for mask in masks:
+            covered |= mask
+        allowed = 0
+        for combination in self.combinations:
+            if combination & covered == combination and all(mask & combination for mask in masks):
+                allowed |= combination
+        for var, mask in zip(self.scope, masks):
+            if mask & ~allowed:
+                for val in [val for val in csp.curr_domains[var] if not allowed >> int(val) & 1]:
+                    csp.prune(var, val, removals)
+        return allowed != 0
 
 
 class SudokuCSP(CSP):
+    """Sudoku of any size n = box * box (9x9, 16x16, 25x25, ...): board is a list of n lists of n
+    ints, 0 for an empty cell. The values of the variables are the digits as strings ('1' to str(n)).
 
-    def __init__(self, board):
+    Variants are given as data:
+        regions     an n x n board of region labels, each label on n cells, replacing the squares (Jigsaw)
+        diagonals   true if the two main diagonals hold different digits too (Diagonal, Sudoku X)
+        cages       a list of (total, [(row, column), ...]): the cells of a cage hold different digits
+                    adding up to total (Killer)
+    The cells of a cage are neighbors, and its sum is a Cage declared in nary: it is checked by
+    CSP.nconflicts and propagated by suppose, for every inference function."""
 
-        self.domains = {}
-        self.neighbors = {}
+    __slots__ = ('size', 'box', 'units', 'var_units', 'classic', 'touched_cages')
+    STATE = CSP.STATE + ('touched_cages',)
+
+    # the variables, neighbors and units (rows, columns and squares) only depend on the size of the
+    # board: they are built once per size and shared, read only, by all the instances (see build_structure).
+    # Jigsaw regions and cages are built for every board
+    structures = {}
+
+    def __init__(self, board, regions=None, diagonals=False, cages=()):
+        self.size = len(board)
+        self.box = math.isqrt(self.size)
+        if self.box * self.box != self.size or any(len(row) != self.size for row in board):
+            raise ValueError('a sudoku board must be n x n with n a square number')
+        n = self.size
+        region_units = None
+        if regions is not None:
+            labels = {}
+            for k, label in enumerate(label for row in regions for label in row):
+                labels.setdefault(label, []).append(k)
+            region_units = list(labels.values())
+            if len(regions) != n or len(region_units) != n or any(len(unit) != n for unit in region_units):
+                raise ValueError('the regions must be an n x n board with n labels on n cells each')
+        cage_cells = tuple(tuple(i * n + j for i, j in cells) for _, cells in cages)
+        self.classic = regions is None and not diagonals and not cages
+        if self.classic:
+            if (n, False) not in SudokuCSP.structures:
+                SudokuCSP.structures[(n, False)] = self.build_structure()
+            structure = SudokuCSP.structures[(n, False)]
+        elif region_units is None and not cages:
+            if (n, True) not in SudokuCSP.structures:
+                SudokuCSP.structures[(n, True)] = self.build_structure(diagonals=True)
+            structure = SudokuCSP.structures[(n, True)]
+        else:
+            structure = self.build_structure(region_units, diagonals, cage_cells)
+        variables, neighbors, self.units, self.var_units, graph = structure
+
+        values = self.digits()
+        domains = {}
         # our variables will be named as "CELL NUMBER"
-        for v in range(81):
-            self.neighbors.update({'CELL' + str(v): {}})
-        for i in range(9):
-            for j in range(9):
-                name = (i * 9 + j)
-                var = "CELL"+str(name)
-                self.add_neighbor(var, self.get_row(i) | self.get_column(j) | self.get_square(i, j))
-                # if the board has a value in cell[i][j] the domain of this variable will be that number
-                if board[i][j] != 0:
-                    self.domains.update({var: str(board[i][j])})
-                else:
-                    self.domains.update({var: '123456789'})
-
-        CSP.__init__(self, None, self.domains, self.neighbors, different_values_constraint)
+        for var, value in zip(variables, (value for row in board for value in row)):
+            # if the board has a value in the cell the domain of this variable will be that number
+            if value != 0:
+                domains[var] = (str(value),)
+            else:
+                domains[var] = values
+
+        CSP.__init__(self, variables, domains, neighbors, different_values_constraint)
+        self.graph = graph
+        if cages:
+            # the neighbors of the structure already hold the pairs of the cages
+            self.declare([Cage([variables[k] for k in cells], total, n)
+                          for (total, _), cells in zip(cages, cage_cells)])
+
+    def build_structure(self, regions=None, diagonals=False, cages=()):
+        """Return (variables, neighbors, units, var_units, graph). units are the rows, the columns, the squares
+        (or the regions, lists of cell indexes) and the diagonals if asked, all of n different digits; they
+        keep the support counts. var_units maps every variable to the indexes of its units and neighbors
+        maps it to a frozenset of the variables sharing a unit or a cage (lists of cell indexes) with it,
+        compiled into graph (a ConstraintGraph). The mappings are read-only views."""
+        n, box = self.size, self.box
+        variables = tuple('CELL' + str(v) for v in range(n * n))
+        units = [[i * n + j for j in range(n)] for i in range(n)]
+        units += [[i * n + j for i in range(n)] for j in range(n)]
+        if regions is None:
+            units += [[(top + r) * n + left + c for r in range(box) for c in range(box)]
+                      for top in range(0, n, box) for left in range(0, n, box)]
+        else:
+            units += [sorted(region) for region in regions]
+        if diagonals:
+            units += [[i * n + i for i in range(n)], [i * n + n - 1 - i for i in range(n)]]
+        var_units = {var: [] for var in variables}
+        peers = {var: set() for var in variables}
+        for u, unit in enumerate(units):
+            for k in unit:
+                var_units[variables[k]].append(u)
+        for group in units + [list(cells) for cells in cages]:
+            group = {variables[k] for k in group}
+            for var in group:
+                peers[var] |= group
+        # we dont want to add variable as its self neighbor
+        neighbors = {var: frozenset(peers[var] - {var}) for var in variables}
+        var_units = {var: tuple(var_units[var]) for var in variables}
+        units = tuple(tuple(variables[k] for k in unit) for unit in units)
+        return (variables, MappingProxyType(neighbors), units, MappingProxyType(var_units),
+                ConstraintGraph(variables, neighbors))
+
+    def reset(self):
+        CSP.reset(self)
+        self.touched_cages = set()
+
+    def digits(self):
+        """Return the values of a cell, ('1', ..., str(size))."""
+        return tuple(str(d) for d in range(1, self.size + 1))
 
     # returns the right square box given row and column index
     def get_square(self, i, j):
-        if i < 3:
-            if j < 3:
-                return self.get_square_box(0)
-            elif j < 6:
-                return self.get_square_box(3)
-            else:
-                return self.get_square_box(6)
-        elif i < 6:
-            if j < 3:
-                return self.get_square_box(27)
-            elif j < 6:
-                return self.get_square_box(30)
-            else:
-                return self.get_square_box(33)
-        else:
-            if j < 3:
-                return self.get_square_box(54)
-            elif j < 6:
-                return self.get_square_box(57)
-            else:
-                return self.get_square_box(60)
+        return self.get_square_box((i - i % self.box) * self.size + j - j % self.box)
 
-    # returns the square of the index's variabile, it must be 0, 3, 6, 27, 30, 33, 54, 57 or 60
+    # returns the square of the index's variable, it must be the top left cell of a square
+    # (on a 9x9 board: 0, 3, 6, 27, 30, 33, 54, 57 or 60)
     def get_square_box(self, index):
-        tmp = set()
-        tmp.add("CELL"+str(index))
-        tmp.add("CELL"+str(index+1))
-        tmp.add("CELL"+str(index+2))
-        tmp.add("CELL"+str(index+9))
-        tmp.add("CELL"+str(index+10))
-        tmp.add("CELL"+str(index+11))
-        tmp.add("CELL"+str(index+18))
-        tmp.add("CELL"+str(index+19))
-        tmp.add("CELL"+str(index+20))
-        return tmp
+        return {'CELL' + str(index + r * self.size + c) for r in range(self.box) for c in range(self.box)}
 
     def get_column(self, index):
-        return {'CELL'+str(j) for j in range(index, index+81, 9)}
+        return {'CELL' + str(j) for j in range(index, self.size * self.size, self.size)}
 
     def get_row(self, index):
-            return {('CELL' + str(x + index * 9)) for x in range(9)}
+        return {('CELL' + str(x + index * self.size)) for x in range(self.size)}
 
-    def add_neighbor(self, var, elements):
-        # we dont want to add variable as its self neighbor
-        self.neighbors.update({var: {x for x in elements if x != var}})
+    # @Modified: CSP.goal_test calls nconflicts for the 81 variables (about 1600 constraint calls),
+    #            the bitmask check of the rows, columns and squares gives the same answer
+    def goal_test(self, state):
+        """The goal is to assign all variables, with all constraints satisfied."""
+        assignment = dict(state)
+        if self.size == 9 and self.classic:
+            return is_complete_solution([assignment.get(var) for var in self.variables])
+        values = set(self.digits())
+        return (len(assignment) == len(self.variables)
+                and all({assignment.get(var) for var in unit} == values for unit in self.units)
+                and all(len({assignment[var] for var in cage.scope}) == len(cage.scope)
+                        and sum(int(assignment[var]) for var in cage.scope) == cage.total for cage in self.nary))
+
+    def to_board(self, assignment):
+        """Return the assignment as a list of lists of ints, 0 where a cell is unassigned."""
+        n = self.size
+        return [[int(assignment.get('CELL' + str(i * n + j), 0)) for j in range(n)] for i in range(n)]
+
+    # the support counts tell, for every unit and digit, how many cells of the unit still allow the digit.
+    # they are kept up to date by suppose, prune and restore so lcv can rank values with a lookup
+    def support_pruning(self):
+        if self.curr_domains is None:
+            CSP.support_pruning(self)
+        if self.support is None:
+            self.support = []
+            for unit in self.units:
+                counts = dict.fromkeys(self.digits(), 0)
+                for var in unit:
+                    for val in self.curr_domains[var]:
+                        counts[val] += 1
+                self.support.append(counts)
+            # what the sums allow before any assignment is not undone by the search
+            for cage in self.nary:
+                cage.prune(self, None, None)
+
+    def suppose(self, var, value):
+        removals = CSP.suppose(self, var, value)
+        for unit in self.var_units[var]:
+            counts = self.support[unit]
+            for _, val in removals:
+                counts[val] -= 1
+        # a cage left without a possible sum empties a domain: mrv picks that variable next and backtracks.
+        # the cages pruned by the inference since the last suppose are propagated now
+        if self.nary:
+            touched = self.touched_cages
+            touched.update(self.var_nary.get(var, ()))
+            while touched:
+                self.nary[touched.pop()].prune(self, None, removals)
+        return removals
+
+    def prune(self, var, value, removals):
+        self.curr_domains[var].remove(value)
+        if removals is not None:
+            removals.append((var, value))
+        for unit in self.var_units[var]:
+            self.support[unit][value] -= 1
+        if self.nary:
+            self.touched_cages.update(self.var_nary.get(var, ()))
+
+    def restore(self, removals):
+        for B, b in removals:
+            self.curr_domains[B].append(b)
+            for unit in self.var_units[B]:
+                self.support[unit][b] += 1
+
+    def nsupports(self, var, val):
+        """Return how many cells sharing a unit with var still allow val (var counted once per unit)."""
+        return sum(self.support[unit][val] for unit in self.var_units[var])
 
@@ -0,0 +1,54 @@
+import io
+import queue
+
+import pytest
+
+import ac3trace
+import Test
+from csp import AC3
+from sudokucsp import SudokuCSP
+
+
+def _csp():
+    t = Test.Test()
+    t.set_board(1, 0)
+    return SudokuCSP(t.original_board)
+
+
+def test_display_tree_still_prints_the_tree():
+    csp = _csp()
+    out = io.StringIO()
+    with pytest.deprecated_call():
+        assert AC3(csp, None, None, True, trace=ac3trace.PrintTrace(out))
+    assert 'AC3 Tree:' in out.getvalue()
+    assert ' -> ' in out.getvalue()
+
+
+def test_ring_trace_is_keyword_only():
+    sink = ac3trace.RingTrace()
+    assert AC3(_csp(), trace=sink)
+    assert sink.events()
+    with pytest.raises(TypeError):
+        AC3(_csp(), None, None, False, sink)
+
+
+def test_binary_trace_drops_instead_of_blocking(tmp_path):
+    sink = ac3trace.BinaryTrace(str(tmp_path / 'trace.bin'), max_pending=1)
+    # a writer that never runs: the queue stays full
+    sink.pending.put(None)
+    sink.writer.join()
+    sink.pending = queue.Queue(1)
+    sink.pending.put(b'')
+    assert sink.begin(_csp()) is None
+    assert sink.dropped == 1
+    assert sink.problem is None
+
+
+def test_binary_trace_reads_back(tmp_path):
+    path = str(tmp_path / 'trace.bin')
+    sink = ac3trace.BinaryTrace(path)
+    assert AC3(_csp(), trace=sink)
+    sink.close()
+    with open(path, 'rb') as f:
+        calls = list(ac3trace.read_trace(f))
+    assert len(calls) == 1 and calls[0][1] and calls[0][2]
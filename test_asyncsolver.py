@@ -0,0 +1,58 @@
+import asyncio
+
+import Test
+from asyncsolver import AsyncSolver, DONE
+
+
+def _board(level, which):
+    t = Test.Test()
+    t.set_board(level, which)
+    return t.original_board
+
+
+def test_cancel_after_the_answer_releases_the_worker_once():
+    async def main():
+        async with AsyncSolver(workers=1) as pool:
+            job = None
+            dispatch = pool._dispatch
+
+            def dispatch_then_cancel(job_id, kind, payload):
+                # the answer resolves the future, then the cancel reaches the task
+                dispatch(job_id, kind, payload)
+                if kind == DONE:
+                    job.cancel()
+
+            pool._dispatch = dispatch_then_cancel
+            job = pool.submit(_board(1, 0))
+            try:
+                await job
+            except asyncio.CancelledError:
+                pass
+            # the worker is idle: it is not told to stop nor waited for
+            assert pool.flags[0] == 0
+            assert not pool.releases
+            await asyncio.sleep(0.1)
+            assert pool.idle.qsize() == 1
+            assert not pool.jobs
+            pool._dispatch = dispatch
+            solution, _ = await pool.solve(_board(1, 1))
+            assert solution is not None
+
+    asyncio.run(main())
+
+
+def test_close_after_a_failed_start():
+    async def main():
+        pool = AsyncSolver(workers=1)
+
+        def fail(slot):
+            raise OSError('no process')
+
+        pool._spawn = fail
+        try:
+            await pool.solve(_board(1, 0))
+        except OSError:
+            pass
+        await pool.close()
+
+    asyncio.run(main())
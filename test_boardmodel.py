@@ -0,0 +1,52 @@
+import pytest
+
+import Test
+from boardmodel import BoardModel
+
+
+def _board(level, which):
+    t = Test.Test()
+    t.set_board(level, which)
+    return t.original_board
+
+
+def _candidates(board, row, col):
+    if board[row][col]:
+        return []
+    used = set(board[row]) | {r[col] for r in board}
+    used |= {board[i][j] for i in range(row - row % 3, row - row % 3 + 3) for j in range(col - col % 3, col - col % 3 + 3)}
+    return [d for d in range(1, 10) if d not in used]
+
+
+def test_candidates_match_a_scan_of_the_board():
+    board = _board(2, 0)
+    model = BoardModel(board)
+    for row in range(9):
+        for col in range(9):
+            assert model.candidates(row, col) == _candidates(board, row, col)
+            if board[row][col] == 0:
+                assert [num for num in range(1, 10) if model.is_valid(num, row, col)] == _candidates(board, row, col)
+
+
+def test_set_updates_the_masks_and_returns_the_peers():
+    board = _board(1, 0)
+    model = BoardModel(board)
+    row, col = next((i, j) for i in range(9) for j in range(9) if board[i][j] == 0)
+    digit = _candidates(board, row, col)[0]
+    changed = model.set(row, col, digit)
+    assert changed[0] == (row, col) and len(changed) == 21
+    board[row][col] = digit
+    assert model.board() == board
+    assert not model.is_valid(digit, row, (col + 1) % 9)
+    model.set(row, col, 0)
+    board[row][col] = 0
+    assert all(model.candidates(i, j) == _candidates(board, i, j) for i in range(9) for j in range(9))
+
+
+def test_other_sizes():
+    model = BoardModel([[0] * 16 for _ in range(16)])
+    assert model.candidates(0, 0) == list(range(1, 17))
+    model.set(0, 0, 16)
+    assert 16 not in model.candidates(3, 3) and 16 in model.candidates(4, 4)
+    with pytest.raises(ValueError):
+        BoardModel([[0] * 5 for _ in range(5)])
@@ -0,0 +1,41 @@
+import cli
+import solver
+import Test
+from puzzleio import Puzzle, board_to_string
+
+
+def _board(level, which):
+    t = Test.Test()
+    t.set_board(level, which)
+    return t.original_board
+
+
+def test_repeated_boards_are_answered_from_the_cache(tmp_path, monkeypatch):
+    board = _board(1, 0)
+    # the same puzzle with the digits relabeled and the board transposed
+    other = [[v % 9 + 1 if v else 0 for v in column] for column in zip(*board)]
+    puzzles = tmp_path / 'puzzles.txt'
+    puzzles.write_text('\n'.join(board_to_string(b) for b in (board, board, other)) + '\n')
+    solutions = tmp_path / 'solutions.txt'
+    searches = []
+    solve_board = solver.solve_board
+    monkeypatch.setattr(solver, 'solve_board', lambda *args, **kwargs: searches.append(args) or solve_board(*args, **kwargs))
+
+    status = cli.main(['solve', '--input', str(puzzles), '--output', str(solutions),
+                       '--cache', str(tmp_path / 'solutions.db')])
+    assert status == 0
+    assert len(searches) == 1
+    lines = solutions.read_text().splitlines()
+    assert len(lines) == 3
+    assert lines[0] == lines[1]
+
+    # the file keeps the solutions for the next run
+    searches.clear()
+    job = cli.SolveJob('backtracking', {}, cache=str(tmp_path / 'solutions.db'))
+    puzzle = job(Puzzle(board))
+    job.close()
+    assert searches == [] and puzzle.meta['cached'] and puzzle.solution is not None
+
+
+def test_cache_needs_one_job(tmp_path):
+    assert cli.main(['solve', '--input', '-', '--cache', str(tmp_path / 'db'), '--jobs', '2']) == 2
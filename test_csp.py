@@ -0,0 +1,61 @@
+import pytest
+
+from csp import (CSP, AllDifferent, NotEqual, Sum, Table, backtracking_search, forward_checking, mac, mrv,
+                 unordered_domain_values)
+
+
+def _problem(neighbors=None):
+    domains = {var: [1, 2, 3] for var in 'ABC'}
+    return CSP(list('ABC'), domains, neighbors,
+               [AllDifferent('AB'), Sum('BC', 5), Table('AC', [(1, 2), (3, 2)])])
+
+
+def test_declare_keeps_the_nary_constraints():
+    csp = _problem()
+    assert [type(c) for c in csp.nary] == [Sum, Table]
+    assert csp.var_nary == {'B': [0], 'C': [0, 1], 'A': [1]}
+    assert csp.neighbors == {'A': {'B'}, 'B': {'A'}, 'C': set()}
+    assert csp.not_equal
+
+
+def test_neighbors_given_are_not_equal_pairs():
+    csp = _problem({'A': ['C'], 'B': [], 'C': ['A']})
+    assert csp.neighbors == {'A': {'B', 'C'}, 'B': {'A'}, 'C': {'A'}}
+    assert csp.nconflicts('C', 1, {'A': 1}) >= 1
+
+
+@pytest.mark.parametrize('inference', [forward_checking, mac])
+def test_declared_constraints_are_solved(inference):
+    assignment = backtracking_search(_problem(), mrv, unordered_domain_values, inference)
+    assert assignment == {'A': 1, 'B': 3, 'C': 2}
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        CSP(['A'], {'A': [1]}, None, [NotEqual(), 'A != B'])
+
+
+
+def test_context_shares_the_problem_not_the_state():
+    csp = _problem().freeze()
+    with pytest.raises(ValueError):
+        backtracking_search(csp, mrv, unordered_domain_values, forward_checking)
+    first, second = csp.context(), csp.context()
+    assert first.nary is csp.nary and first.neighbors is csp.neighbors
+    assert backtracking_search(first, mrv, unordered_domain_values, forward_checking)
+    assert first.nassigns and not second.nassigns and second.curr_domains is None
+    with pytest.raises(TypeError):
+        csp.domains['A'] = (1,)
+
+
+def test_sudoku_contexts_search_apart():
+    import Test
+    from sudokucsp import SudokuCSP
+    t = Test.Test()
+    t.set_board(2, 1)
+    problem = SudokuCSP(t.original_board).freeze()
+    first, second = problem.context(), problem.context()
+    expected = backtracking_search(first, mrv, unordered_domain_values, forward_checking)
+    assert first.support is not None and second.support is None
+    assert backtracking_search(second, mrv, unordered_domain_values, forward_checking) == expected
+    assert first.n_bt == second.n_bt and problem.n_bt == 0
@@ -0,0 +1,67 @@
+import struct
+import zlib
+
+import pytest
+
+np = pytest.importorskip('numpy')
+imageimport = pytest.importorskip('imageimport')
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def _chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def _png(rows, filters, ihdr=True):
+    """An 8 bits gray PNG of rows (lists of ints), row y filtered with filters[y]."""
+    height, width = len(rows), len(rows[0])
+    raw = bytearray()
+    previous = [0] * width
+    for row, kind in zip(rows, filters):
+        raw.append(kind)
+        for x, value in enumerate(row):
+            left = row[x - 1] if x else 0
+            upper_left = previous[x - 1] if x else 0
+            predictor = [0, left, previous[x], (left + previous[x]) >> 1, _paeth(left, previous[x], upper_left)][kind]
+            raw.append((value - predictor) & 255)
+        previous = row
+    data = b'\x89PNG\r\n\x1a\n'
+    if ihdr:
+        data += _chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+    return data + _chunk(b'IDAT', zlib.compress(bytes(raw))) + _chunk(b'IEND', b'')
+
+
+@pytest.mark.parametrize('kind', range(5))
+def test_every_filter(tmp_path, kind):
+    rows = [[(x * 37 + y * 91 + x * y) % 256 for x in range(13)] for y in range(7)]
+    path = tmp_path / 'image.png'
+    path.write_bytes(_png(rows, [kind] * len(rows)))
+    assert imageimport.read_png(str(path)).tolist() == rows
+
+
+def test_mixed_filters(tmp_path):
+    rows = [[(x * x + 5 * y) % 256 for x in range(9)] for y in range(10)]
+    path = tmp_path / 'image.png'
+    path.write_bytes(_png(rows, [y % 5 for y in range(10)]))
+    assert imageimport.read_png(str(path)).tolist() == rows
+
+
+def test_no_ihdr(tmp_path):
+    path = tmp_path / 'image.png'
+    path.write_bytes(_png([[0]], [0], ihdr=False))
+    with pytest.raises(ValueError, match='no IHDR'):
+        imageimport.read_png(str(path))
+
+
+def test_not_a_png(tmp_path):
+    path = tmp_path / 'image.png'
+    path.write_bytes(b'GIF89a')
+    with pytest.raises(ValueError):
+        imageimport.read_png(str(path))
@@ -0,0 +1,47 @@
+import Test
+from csp import backtracking_search, mrv, unordered_domain_values, forward_checking
+from presolver import presolve, is_solved, format_trace
+from sudokucsp import SudokuCSP
+
+
+def _board(level, which):
+    t = Test.Test()
+    t.set_board(level, which)
+    return t.original_board
+
+
+def _counts(csp):
+    return [{val: sum(val in csp.curr_domains[var] for var in unit) for val in csp.digits()} for unit in csp.units]
+
+
+def test_easy_board_is_solved_by_logic():
+    csp = SudokuCSP(_board(1, 1))
+    trace = presolve(csp)
+    assert is_solved(csp)
+    assert trace == [('naked single', 46)]
+    assert csp.goal_test({var: csp.curr_domains[var][0] for var in csp.variables})
+    assert csp.support == _counts(csp)
+
+
+def test_hard_board_keeps_its_solution():
+    board = _board(2, 1)
+    expected = backtracking_search(SudokuCSP(board), mrv, unordered_domain_values, forward_checking)
+    csp = SudokuCSP(board)
+    presolve(csp)
+    assert all(expected[var] in csp.curr_domains[var] for var in csp.variables)
+    assert csp.support == _counts(csp)
+    assert backtracking_search(csp, mrv, unordered_domain_values, forward_checking) == expected
+
+
+def test_broken_board_empties_a_domain():
+    board = [[0] * 9 for _ in range(9)]
+    board[0][:8] = [1, 2, 3, 4, 5, 6, 7, 8]
+    board[8][8] = 9
+    csp = SudokuCSP(board)
+    presolve(csp)
+    assert any(not csp.curr_domains[var] for var in csp.variables)
+
+
+def test_format_trace():
+    assert format_trace([('naked single', 41), ('x-wing', 1)]) == 'naked single x41, x-wing x1'
+    assert format_trace([]) == 'none'
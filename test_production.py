@@ -0,0 +1,36 @@
+from production import derive_seed, make_puzzle, produce
+from solver import count_solutions
+from verifier import is_solution
+
+
+def test_a_puzzle_only_depends_on_seed_and_index():
+    first = make_puzzle(7, 3, remove=40)
+    again = make_puzzle(7, 3, remove=40)
+    assert first.board == again.board and first.meta == again.meta
+    assert make_puzzle(7, 4, remove=40).board != first.board
+    assert derive_seed(7, 3) != derive_seed(3, 7)
+
+
+def test_puzzles_are_unique_and_rated():
+    puzzle = make_puzzle(1, 0, remove=45)
+    assert is_solution(puzzle.solution, puzzle.board)
+    assert count_solutions(puzzle.board, limit=2) == 1
+    assert puzzle.meta['clues'] == sum(1 for row in puzzle.board for v in row if v)
+    assert {'difficulty', 'techniques', 'key', 'seed', 'index'} <= set(puzzle.meta)
+
+
+def test_runs_are_reproducible_whatever_the_workers():
+    alone = [p.board for p in produce(4, seed=2, remove=40)]
+    pooled = [p.board for p in produce(4, seed=2, remove=40, jobs=2, chunksize=1)]
+    assert alone == pooled
+    resumed = [p.board for p in produce(2, seed=2, remove=40, start=2)]
+    assert resumed == alone[2:]
+
+
+def test_duplicates_are_dropped(monkeypatch):
+    import production
+    stats = {}
+    puzzle = make_puzzle(0, 0, remove=40)
+    monkeypatch.setattr(production, 'make_puzzle', lambda seed, index, remove: puzzle)
+    assert len(list(produce(3, stats=stats))) == 1
+    assert stats == {'made': 3, 'duplicates': 2}
@@ -0,0 +1,49 @@
+import pytest
+
+import Test
+from puzzleio import Puzzle
+from puzzlebank import PuzzleBank, write_bank, pack_board, unpack_board, HEADER, RECORD
+
+
+def _board(level, which):
+    t = Test.Test()
+    t.set_board(level, which)
+    return t.original_board
+
+
+def test_pack_round_trip():
+    board = _board(2, 0)
+    assert len(pack_board(board)) == 41
+    assert unpack_board(pack_board(board)) == board
+
+
+def test_bank_round_trip(tmp_path):
+    path = str(tmp_path / 'puzzles.bank')
+    solution = [[(3 * (i % 3) + i // 3 + j) % 9 + 1 for j in range(9)] for i in range(9)]
+    puzzles = [Puzzle(_board(1, 0), solution, {'difficulty': 7}), Puzzle(_board(2, 0))]
+    assert write_bank(puzzles, path) == 2
+    with PuzzleBank(path) as bank:
+        assert len(bank) == 2
+        assert bank[0].board == _board(1, 0) and bank[0].solution == solution
+        assert bank[0].meta['difficulty'] == 7
+        assert bank[-1].solution is None and bank.board(1) == _board(2, 0)
+        assert bank.sample(low=7, high=7) == 0
+        assert bank.sample(low=8) is None
+        with pytest.raises(IndexError):
+            bank[2]
+
+
+@pytest.mark.parametrize('data', [b'', b'SDKBANK\0', b'x' * 64])
+def test_not_a_bank(tmp_path, data):
+    path = tmp_path / 'bad.bank'
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match='bad.bank'):
+        PuzzleBank(str(path))
+
+
+def test_truncated_bank(tmp_path):
+    path = tmp_path / 'puzzles.bank'
+    write_bank([Puzzle(_board(1, 0))] * 3, str(path))
+    path.write_bytes(path.read_bytes()[:HEADER.size + 2 * RECORD.size])
+    with pytest.raises(ValueError, match='truncated'):
+        PuzzleBank(str(path))
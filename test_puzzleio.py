@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+import Test
+from puzzleio import (Puzzle, board_from_string, board_to_string, read_puzzles, write_puzzles, solve_puzzles,
+                      filter_puzzles)
+from verifier import is_solution
+
+
+def _board(level, which):
+    t = Test.Test()
+    t.set_board(level, which)
+    return t.original_board
+
+
+def _roundtrip(puzzles, fmt):
+    out = io.StringIO()
+    assert write_puzzles(puzzles, out, fmt) == len(puzzles)
+    return list(read_puzzles(io.StringIO(out.getvalue()), fmt))
+
+
+@pytest.mark.parametrize('fmt', ['lines', 'csv', 'grid'])
+def test_formats_round_trip(fmt):
+    boards = [_board(1, 0), _board(2, 1)]
+    assert [p.board for p in _roundtrip([Puzzle(b) for b in boards], fmt)] == boards
+
+
+def test_csv_keeps_the_solution_and_metadata():
+    board = _board(1, 0)
+    solution = next(solve_puzzles([Puzzle(board)])).solution
+    (puzzle,) = _roundtrip([Puzzle(board, solution, {'difficulty': 3})], 'csv')
+    assert puzzle.solution == solution
+    assert puzzle.meta == {'difficulty': '3'}
+
+
+def test_lines_accept_dots_and_comments():
+    text = '# a comment\n\n' + board_to_string(_board(1, 0), empty='.') + '\n'
+    assert [p.board for p in read_puzzles(io.StringIO(text))] == [_board(1, 0)]
+
+
+def test_bad_input():
+    with pytest.raises(ValueError):
+        board_from_string('123')
+    with pytest.raises(ValueError):
+        list(read_puzzles(io.StringIO('1 2 3\n'), 'grid'))
+
+
+def test_format_from_the_file_name(tmp_path):
+    path = str(tmp_path / 'puzzles.csv')
+    write_puzzles([Puzzle(_board(1, 0))], path)
+    with open(path) as f:
+        assert f.readline().startswith('puzzle,solution')
+    assert [p.board for p in read_puzzles(path)] == [_board(1, 0)]
+
+
+def test_stages_stream():
+    puzzles = (Puzzle(b) for b in [_board(1, 0), _board(2, 0)])
+    solved = list(filter_puzzles(solve_puzzles(puzzles), lambda p: p.meta['n_bt'] >= 0))
+    assert len(solved) == 2
+    assert all(is_solution(p.solution, p.board) for p in solved)
@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+import Test
+from sat import CDCL, luby, encode, sat_solve, write_dimacs
+from sudokucsp import SudokuCSP
+
+
+def _board(level, which):
+    t = Test.Test()
+    t.set_board(level, which)
+    return t.original_board
+
+
+def test_luby():
+    assert [luby(i) for i in range(15)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+
+
+def test_cdcl_sat_and_unsat():
+    solver = CDCL(3)
+    for clause in ([1, 2], [-1, 3], [-3, -2], [2, 3]):
+        assert solver.add_clause(clause)
+    assert solver.solve()
+    # the model holds the true variables
+    assert all(any((lit > 0) == (abs(lit) in solver.model) for lit in clause)
+               for clause in ([1, 2], [-1, 3], [-3, -2], [2, 3]))
+
+    solver = CDCL(2)
+    for clause in ([1, 2], [1, -2], [-1, 2], [-1, -2]):
+        solver.add_clause(clause)
+    assert solver.solve() is False and solver.model is None
+
+
+@pytest.mark.parametrize('level, which', [(1, 0), (2, 0), (2, 1)])
+def test_sat_solves_the_boards(level, which):
+    csp = SudokuCSP(_board(level, which))
+    assignment, stats = sat_solve(csp)
+    assert csp.goal_test(assignment)
+    assert all(assignment[var] == csp.domains[var][0] for var in csp.variables if len(csp.domains[var]) == 1)
+
+
+def test_sat_refutes_a_broken_board():
+    board = _board(1, 0)
+    row = board[0]
+    # a digit of the first row repeated in an empty cell of the same row
+    given = next(v for v in row if v)
+    board[0] = [given if v == 0 and k == row.index(0) else v for k, v in enumerate(row)]
+    assert sat_solve(SudokuCSP(board))[0] is None
+
+
+def test_dimacs():
+    clauses, num_vars = encode(SudokuCSP(_board(1, 0)))
+    out = io.StringIO()
+    write_dimacs(clauses, num_vars, out, ['a puzzle'])
+    lines = out.getvalue().splitlines()
+    assert lines[0] == 'c a puzzle'
+    assert lines[1] == 'p cnf {} {}'.format(729, len(clauses))
+    assert len(lines) == 2 + len(clauses)
+    assert all(line.endswith(' 0') for line in lines[2:])
+    assert all(1 <= abs(int(lit)) <= 729 for line in lines[2:] for lit in line.split()[:-1])
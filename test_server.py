@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import Test
+from puzzleio import board_to_string
+from server import SolveService, run_batch
+
+
+def _puzzle(level=1, which=0):
+    t = Test.Test()
+    t.set_board(level, which)
+    return board_to_string(t.original_board)
+
+
+def test_batch_status_codes():
+    # the easy puzzle takes 82 choices, the hard one about 3000
+    solved, over, bad = run_batch([('/solve', {'puzzle': _puzzle()}), ('/solve', {'puzzle': _puzzle(2, 1)}),
+                                   ('/solve', {'puzzle': '123'})], budget=(200, None))
+    assert solved['solution'] and 'error' not in solved
+    assert over['status'] == 504
+    assert bad['status'] == 400
+
+
+async def _exchange(port, request):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(request)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split()[1])
+    length = int(next(line for line in head.decode().split('\r\n') if line.startswith('Content-Length')).split(':')[1])
+    body = json.loads(await reader.readexactly(length))
+    writer.close()
+    return status, body
+
+
+def _post(path, body, length=None):
+    data = json.dumps(body).encode()
+    return ('POST {} HTTP/1.1\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'.format(
+        path, len(data) if length is None else length).encode() + data)
+
+
+def test_http_status_codes():
+    async def main():
+        service = SolveService(workers=1, max_nodes=200, max_seconds=5)
+        started = asyncio.get_running_loop().create_future()
+        serving = asyncio.create_task(service.serve('127.0.0.1', 0, started.set_result))
+        server = await started
+        port = server.sockets[0].getsockname()[1]
+        try:
+            answers = {}
+            for name, request in [
+                    ('solve', _post('/solve', {'puzzle': _puzzle()})),
+                    ('validate', _post('/validate', {'solution': '1' * 81})),
+                    ('bad length', _post('/solve', {}, 'abc')),
+                    ('negative length', _post('/solve', {}, -1)),
+                    ('too large', _post('/solve', {}, 10 ** 6)),
+                    ('not json', b'POST /solve HTTP/1.1\r\nContent-Length: 3\r\nConnection: close\r\n\r\nabc'),
+                    ('unknown', _post('/nowhere', {})),
+                    ('method', b'GET /solve HTTP/1.1\r\nConnection: close\r\n\r\n'),
+                    ('over budget', _post('/solve', {'puzzle': _puzzle(2, 1)}))]:
+                answers[name] = await asyncio.wait_for(_exchange(port, request), 60)
+        finally:
+            serving.cancel()
+            try:
+                await serving
+            except asyncio.CancelledError:
+                pass
+        return answers
+
+    answers = asyncio.run(main())
+    assert answers['solve'][0] == 200 and answers['solve'][1]['solution']
+    assert answers['validate'] == (200, {'valid': False})
+    assert answers['bad length'][0] == 400
+    assert answers['negative length'][0] == 400
+    assert answers['too large'][0] == 413
+    assert answers['not json'][0] == 400
+    assert answers['unknown'][0] == 404
+    assert answers['method'][0] == 405
+    assert answers['over budget'][0] == 504
@@ -0,0 +1,44 @@
+import time
+
+from puzzleio import board_to_string
+from solutioncache import SolutionCache, canonical_form
+import Test
+
+
+def _board(level, which):
+    t = Test.Test()
+    t.set_board(level, which)
+    return t.original_board
+
+
+def test_sparse_boards_skip_the_cache_quickly():
+    cache = SolutionCache()
+    one_clue = [[0] * 9 for _ in range(9)]
+    one_clue[4][4] = 5
+    for board in ([[0] * 9 for _ in range(9)], one_clue):
+        start = time.perf_counter()
+        assert cache.get(board) is None
+        cache.put(board, board)
+        assert cache.solve(board, lambda b: 'searched') == 'searched'
+        assert time.perf_counter() - start < 1
+    assert len(cache) == 0
+
+
+def test_puzzles_are_still_cached():
+    cache = SolutionCache()
+    board = _board(2, 1)
+    solution = [[(3 * (i % 3) + i // 3 + j) % 9 + 1 for j in range(9)] for i in range(9)]
+    assert cache.solve(board, lambda b: solution) == solution
+    assert cache.get(board) == solution
+    assert cache.hits == 1
+
+
+def test_equivalent_boards_share_the_canonical_form():
+    board = _board(1, 0)
+    relabel = {0: 0, **{d: d % 9 + 1 for d in range(1, 10)}}
+    # digits relabeled, board transposed, the first two bands and two rows of the last one swapped
+    other = [[relabel[v] for v in column] for column in zip(*board)]
+    other = other[3:6] + other[0:3] + [other[6], other[8], other[7]]
+    key, transform = canonical_form(board)
+    assert canonical_form(other)[0] == key
+    assert board_to_string(transform.apply(board)) == key
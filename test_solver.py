@@ -0,0 +1,28 @@
+import itertools
+
+import Test
+import solver
+from verifier import is_solution
+
+
+def _board(level, which):
+    t = Test.Test()
+    t.set_board(level, which)
+    return t.original_board
+
+
+def test_solutions_are_enumerated_lazily():
+    board = _board(1, 1)
+    board[0] = [0] * 9
+    found = list(itertools.islice(solver.solutions(board), 3))
+    assert found and all(is_solution(s, board) for s in found)
+    assert len({str(s) for s in found}) == len(found)
+
+
+def test_count_solutions_with_a_limit():
+    assert solver.count_solutions(_board(2, 1), limit=2) == 1
+    assert solver.count_solutions([[0] * 9 for _ in range(9)], limit=5) == 5
+    broken = _board(2, 1)
+    broken[0][0] = broken[0][1] = next(d for d in range(1, 10) if d not in broken[0])
+    assert solver.count_solutions(broken, limit=2) == 0
+
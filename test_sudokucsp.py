@@ -0,0 +1,65 @@
+import pytest
+
+import Test
+from csp import backtracking_search, mrv, lcv, unordered_domain_values, no_inference, forward_checking, mac
+from sudokucsp import SudokuCSP, Cage
+
+
+def _board(level, which):
+    t = Test.Test()
+    t.set_board(level, which)
+    return t.original_board
+
+
+def _solution(board):
+    s = SudokuCSP(board)
+    return s.to_board(backtracking_search(s, mrv, unordered_domain_values, forward_checking))
+
+
+def _counts(csp):
+    return [{val: sum(val in csp.curr_domains[var] for var in unit) for val in csp.digits()} for unit in csp.units]
+
+
+def test_support_counts_follow_suppose_prune_and_restore():
+    csp = SudokuCSP(_board(2, 0))
+    csp.support_pruning()
+    assert csp.support == _counts(csp)
+    var = next(var for var in csp.variables if len(csp.curr_domains[var]) > 1)
+    removals = csp.suppose(var, csp.curr_domains[var][0])
+    assert forward_checking(csp, var, csp.curr_domains[var][0], {}, removals)
+    assert csp.support == _counts(csp)
+    csp.restore(removals)
+    assert csp.support == _counts(csp)
+
+
+@pytest.mark.parametrize('inference', [no_inference, forward_checking, mac])
+@pytest.mark.parametrize('order', [unordered_domain_values, lcv])
+def test_killer_cages_are_declared_sums(inference, order):
+    solution = _solution(_board(2, 0))
+    cages = [(solution[i][j] + solution[i][j + 1], [(i, j), (i, j + 1)]) for i in range(9) for j in range(0, 8, 2)]
+    board = [[v if (i + j) % 4 == 0 else 0 for j, v in enumerate(row)] for i, row in enumerate(solution)]
+    csp = SudokuCSP(board, cages=cages)
+    assert len(csp.nary) == len(cages) and all(isinstance(cage, Cage) for cage in csp.nary)
+    assignment = backtracking_search(csp, mrv, order, inference)
+    assert csp.goal_test(assignment)
+    assert csp.to_board(assignment) == solution
+
+
+def test_cage_conflicts():
+    # 17 is 8 + 9 only
+    csp = SudokuCSP([[0] * 9 for _ in range(9)], cages=[(17, [(0, 0), (0, 1)])])
+    assert csp.nconflicts('CELL0', '9', {'CELL1': '8'}) == 0
+    assert csp.nconflicts('CELL0', '7', {}) == 1
+    csp.support_pruning()
+    assert csp.curr_domains['CELL0'] == ['8', '9']
+
+
+def test_lcv_ranks_by_the_support_counts():
+    csp = SudokuCSP(_board(2, 1))
+    csp.support_pruning()
+    var = next(var for var in csp.variables if len(csp.curr_domains[var]) > 2)
+    units = [set(unit) for unit in csp.units if var in unit]
+    for val in csp.curr_domains[var]:
+        assert csp.nsupports(var, val) == sum(val in csp.curr_domains[other] for unit in units for other in unit)
+    ranked = lcv(var, {}, csp)
+    assert [csp.nsupports(var, val) for val in ranked] == sorted(csp.nsupports(var, val) for val in ranked)
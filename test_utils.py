@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from utils import PriorityQueue
+
+
+def test_pops_in_order_first_in_first_out_on_ties():
+    items = [(random.Random(k).randrange(10), k) for k in range(200)]
+    q = PriorityQueue(f=lambda item: item[0])
+    for item in items:
+        q.append(item)
+    assert len(q) == len(items)
+    assert [q.pop() for _ in items] == sorted(items, key=lambda item: item[0])
+
+
+def test_max_order():
+    q = PriorityQueue(order=max)
+    for x in [3, 1, 4, 1, 5, 9, 2, 6]:
+        q.append(x)
+    assert [q.pop() for _ in range(len(q))] == [9, 6, 5, 4, 3, 2, 1]
+
+
+def test_update_remove_and_lookup():
+    f = {'a': 5, 'b': 3, 'c': 4}
+    q = PriorityQueue(f=f.get)
+    for item in 'abc':
+        q.append(item)
+    f['a'] = 1
+    q.update('a')
+    assert 'a' in q and q['a'] == 'a' and q['z'] is None
+    q.remove('b')
+    del q['z']
+    with pytest.raises(KeyError):
+        q.remove('b')
+    assert [q.pop(), q.pop()] == ['a', 'c']
+
+
+def test_append_of_a_queued_item_rekeys_it():
+    f = {'a': 5, 'b': 3}
+    q = PriorityQueue(f=f.get)
+    q.append('a')
+    q.append('b')
+    f['a'] = 1
+    q.append('a')
+    assert len(q) == 2
+    assert q.pop() == 'a'
+
+
+def test_pop_from_empty_raises_index_error():
+    q = PriorityQueue()
+    with pytest.raises(IndexError):
+        q.pop()
+    q.append(1)
+    q.pop()
+    with pytest.raises(IndexError):
+        q.pop()
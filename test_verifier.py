@@ -0,0 +1,39 @@
+import Test
+from puzzleio import board_to_string
+from verifier import is_complete_solution, is_solution, validate_many
+
+SOLUTION = [[(3 * (i % 3) + i // 3 + j) % 9 + 1 for j in range(9)] for i in range(9)]
+
+
+def test_valid_solution_in_every_shape():
+    text = board_to_string(SOLUTION)
+    assert is_solution(SOLUTION)
+    assert is_solution(text)
+    assert is_complete_solution([int(c) for c in text])
+
+
+def test_invalid_boards():
+    swapped = [row[:] for row in SOLUTION]
+    swapped[0][0], swapped[0][1] = swapped[0][1], swapped[0][0]
+    assert not is_solution(swapped)
+    empty = [row[:] for row in SOLUTION]
+    empty[4][4] = 0
+    assert not is_solution(empty)
+    assert not is_complete_solution(board_to_string(SOLUTION)[:80])
+    # a 0 or a 10 has no bit
+    assert not is_complete_solution(['0'] + list(board_to_string(SOLUTION))[1:])
+
+
+def test_the_givens_must_be_kept():
+    puzzle = [[v if (i + j) % 3 == 0 else 0 for j, v in enumerate(row)] for i, row in enumerate(SOLUTION)]
+    assert is_solution(SOLUTION, puzzle)
+    assert is_solution(SOLUTION, board_to_string(puzzle, empty='.'))
+    other = [[v % 9 + 1 for v in row] for row in SOLUTION]
+    assert not is_solution(other, puzzle)
+
+
+def test_validate_many():
+    t = Test.Test()
+    t.set_board(1, 0)
+    pairs = [(t.original_board, SOLUTION), (None, SOLUTION), (None, [[1] * 9] * 9)]
+    assert list(validate_many(pairs)) == [False, True, False]
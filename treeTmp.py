@@ -1,3 +1,6 @@
+from csp import ConstraintGraph
+
+
 class Constraint:
     def __init__(self, var1, var2):
         self.var1 = var1
@@ -8,29 +11,43 @@ class Constraint:
         # For simplicity, let's assume variables are integers
         return abs(assignment[self.var1] - assignment[self.var2]) > 1
 
+
+# @Modified: build_tree tried every pair of variables (O(V^2)) and kept the pairs where
+#            is_satisfied({var1: 0, var2: 0}) held, which is never: the tree was always empty.
+#            The arcs are now the ones of the constraints, read from a ConstraintGraph (the one of
+#            a CSP can be given, e.g. csp.constraint_graph())
 class ArcConsistencyTree:
-    def __init__(self, variables, constraints):
+    def __init__(self, variables, constraints, graph=None):
         self.variables = variables
         self.constraints = constraints
+        self.graph = graph
         self.arc_tree = {}
 
+    def build_graph(self):
+        neighbors = {var: set() for var in self.variables}
+        for constraint in self.constraints:
+            neighbors[constraint.var1].add(constraint.var2)
+            neighbors[constraint.var2].add(constraint.var1)
+        return ConstraintGraph(self.variables, neighbors)
+
     def build_tree(self):
-        for var1 in self.variables:
-            for var2 in self.variables:
-                if var1 != var2:
-                    constraint = Constraint(var1, var2)
-                    if constraint.is_satisfied({var1: 0, var2: 0}):
-                        if var1 not in self.arc_tree:
-                            self.arc_tree[var1] = []
-                        self.arc_tree[var1].append(var2)
+        if self.graph is None:
+            self.graph = self.build_graph()
+        graph = self.graph
+        for i, var1 in enumerate(graph.variables):
+            start, end = graph.offsets[i], graph.offsets[i + 1]
+            if start < end:
+                self.arc_tree[var1] = [graph.variables[j] for j in graph.targets[start:end]]
 
     def print_tree(self):
         for var, neighbors in self.arc_tree.items():
             print(f"{var} -> {neighbors}")
 
-# Example usage:
-variables = [1, 2, 3, 4]
-constraints = [Constraint(1, 2), Constraint(1, 3), Constraint(2, 3), Constraint(3, 4)]
-arc_tree = ArcConsistencyTree(variables, constraints)
-arc_tree.build_tree()
-arc_tree.print_tree()
+
+if __name__ == '__main__':
+    # Example usage:
+    variables = [1, 2, 3, 4]
+    constraints = [Constraint(1, 2), Constraint(1, 3), Constraint(2, 3), Constraint(3, 4)]
+    arc_tree = ArcConsistencyTree(variables, constraints)
+    arc_tree.build_tree()
+    arc_tree.print_tree()
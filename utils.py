@@ -749,37 +749,107 @@ class PriorityQueue(Queue):
     """A queue in which the minimum (or maximum) element (as determined by f and
     order) is returned first. If order is min, the item with minimum f(x) is
     returned first; if order is max, then it is the item with maximum f(x).
-    Also supports dict-like lookup."""
+    Also supports dict-like lookup.
+
+    @modified: the original kept a sorted list with bisect.insort, so pop (for min)
+    and the lookups were O(n). This is an indexed binary heap: append, pop, update
+    (decrease-key) and removal are O(log n) and membership is O(1). Items with the
+    same f are returned first in, first out, and pop on an empty queue raises
+    IndexError as list.pop did.
+    Unlike the sorted list, the items must be hashable and are kept once: appending
+    an item already queued adds no second entry, it recomputes f(item) and moves the
+    item like update does."""
 
     def __init__(self, order=min, f=lambda x: x):
-        self.A = []
+        self.heap = []   # entries [f(item), insertion count, item]
+        self.index = {}  # item -> position of its entry in heap
         self.order = order
         self.f = f
+        self.count = 0
+
+    def _before(self, a, b):
+        if a[0] == b[0]:
+            return a[1] < b[1]
+        return a[0] < b[0] if self.order == min else a[0] > b[0]
+
+    def _place(self, i, entry):
+        self.heap[i] = entry
+        self.index[entry[2]] = i
+
+    def _sift_up(self, i):
+        entry = self.heap[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if not self._before(entry, self.heap[parent]):
+                break
+            self._place(i, self.heap[parent])
+            i = parent
+        self._place(i, entry)
+
+    def _sift_down(self, i):
+        heap = self.heap
+        entry = heap[i]
+        n = len(heap)
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and self._before(heap[child + 1], heap[child]):
+                child += 1
+            if not self._before(heap[child], entry):
+                break
+            self._place(i, heap[child])
+            i = child
+        self._place(i, entry)
 
     def append(self, item):
-        bisect.insort(self.A, (self.f(item), item))
+        if item in self.index:
+            self.update(item)
+            return
+        self.count += 1
+        self.heap.append([self.f(item), self.count, item])
+        self._sift_up(len(self.heap) - 1)
+
+    def update(self, item):
+        """Recompute f(item) and move item to its new place (decrease-key, or increase-key)."""
+        i = self.index[item]
+        self.heap[i][0] = self.f(item)
+        self._sift_up(i)
+        self._sift_down(self.index[item])
 
     def __len__(self):
-        return len(self.A)
+        return len(self.heap)
+
+    def _remove_at(self, i):
+        entry = self.heap[i]
+        del self.index[entry[2]]
+        last = self.heap.pop()
+        if i < len(self.heap):
+            self._place(i, last)
+            self._sift_up(i)
+            self._sift_down(self.index[last[2]])
+        return entry[2]
 
     def pop(self):
-        if self.order == min:
-            return self.A.pop(0)[1]
-        else:
-            return self.A.pop()[1]
+        if not self.heap:
+            raise IndexError('pop from an empty PriorityQueue')
+        return self._remove_at(0)
 
     def __contains__(self, item):
-        return any(item == pair[1] for pair in self.A)
+        return item in self.index
 
     def __getitem__(self, key):
-        for _, item in self.A:
-            if item == key:
-                return item
+        i = self.index.get(key)
+        if i is not None:
+            return self.heap[i][2]
 
     def __delitem__(self, key):
-        for i, (value, item) in enumerate(self.A):
-            if item == key:
-                self.A.pop(i)
+        if key in self.index:
+            self._remove_at(self.index[key])
+
+    def remove(self, item):
+        """Remove item from the queue; KeyError if it is not queued."""
+        self._remove_at(self.index[item])
 
 
 # ______________________________________________________________________________
@@ -0,0 +1,68 @@
+"""Fast checks of completed 9x9 boards with one bitmask per row, column and square.
+
+A unit is valid when the OR of 1 << digit over its 9 cells is exactly FULL, which can only
+happen with 9 different digits from 1 to 9. The 27 masks are filled in one pass over
+the 81 cells, so a check is a few hundred integer operations instead of the ~1600
+constraint calls of CSP.goal_test.
+"""
+
+FULL = 0b1111111110
+# digit (int or one char string) -> bit, anything else has no bit and fails the check
+BITS = {}
+for _d in range(1, 10):
+    BITS[_d] = BITS[str(_d)] = 1 << _d
+# for every cell: (row mask, column mask, square mask) indexes in a list of 27 masks
+UNITS_OF = [(k // 9, 9 + k % 9, 18 + (k // 27) * 3 + (k % 9) // 3) for k in range(81)]
+
+
+def _cells(board):
+    """Accept a board as a list of lists or as a flat sequence/string of 81 cells."""
+    if len(board) == 9:
+        return [v for row in board for v in row]
+    return board
+
+
+def is_complete_solution(cells):
+    """Return true if the 81 cells (ints or chars, row by row) are a valid completed board."""
+    if len(cells) != 81:
+        return False
+    masks = [0] * 27
+    for k, value in enumerate(cells):
+        bit = BITS.get(value)
+        if bit is None:
+            return False
+        r, c, s = UNITS_OF[k]
+        masks[r] |= bit
+        masks[c] |= bit
+        masks[s] |= bit
+    return masks.count(FULL) == 27
+
+
+def is_solution(solution, puzzle=None):
+    """Return true if solution is a valid completed board that keeps every given of puzzle.
+    Both can be lists of lists, flat lists or 81 chars strings ('0' or '.' for empty)."""
+    cells = _cells(solution)
+    if not is_complete_solution(cells):
+        return False
+    if puzzle is not None:
+        for given, value in zip(_cells(puzzle), cells):
+            if given not in (0, '0', '.') and BITS.get(given) != BITS[value]:
+                return False
+    return True
+
+
+def _check(pair):
+    puzzle, solution = pair
+    return is_solution(solution, puzzle)
+
+
+def validate_many(pairs, jobs=1, chunksize=1024):
+    """Yield is_solution(solution, puzzle) for every (puzzle, solution) pair, in order.
+    With jobs > 1 the pairs are checked by a pool of processes, chunksize at a time."""
+    if jobs <= 1:
+        for puzzle, solution in pairs:
+            yield is_solution(solution, puzzle)
+    else:
+        from multiprocessing import Pool
+        with Pool(jobs) as pool:
+            yield from pool.imap(_check, pairs, chunksize)